@@ -6,14 +6,22 @@ import traceback
 from datetime import datetime
 from io import StringIO
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtWidgets import QApplication, QStyleFactory, QMessageBox, QInputDialog
 
 import check_updates
 import gui.main_window as mw
-from constants import INPUT_TEAMS_FILE, INPUT_STUDENT_FILE, VERSION
-from process import generate_output
+from constants import (
+    INPUT_TEAMS_FILE,
+    INPUT_STUDENT_FILE,
+    VERSION,
+    WATCH_LEDGER_NAME,
+    WATCH_SETTLE_SECONDS,
+)
+from watch import FolderWatcher, ProcessedLedger
+from worker import ProcessWorker, UpdateCheckWorker, WatchWorker
 
 # Copyright © 2020, Dylan Armitage. Some rights reserved.
 # This work is licensed under the GNU General Public License, version 3.
@@ -27,13 +35,19 @@ class MainWindow(QtWidgets.QMainWindow, mw.Ui_MainWindow):
         super(MainWindow, self).__init__(parent)
         self.setupUi(self)
         self.__setup_buttons()
-        version_label = QtWidgets.QLabel()
-        version_label.setText(f"Version: {VERSION} {self.check_updates(at_start=True)}")
-        version_label.setFrameShape(QtWidgets.QFrame.StyledPanel)
-        version_label.setFrameShadow(QtWidgets.QFrame.Sunken)
-        self.statusbar.addPermanentWidget(version_label)
+        self.version_label = QtWidgets.QLabel()
+        self.version_label.setText(f"Version: {VERSION}")
+        self.version_label.setFrameShape(QtWidgets.QFrame.StyledPanel)
+        self.version_label.setFrameShadow(QtWidgets.QFrame.Sunken)
+        self.statusbar.addPermanentWidget(self.version_label)
+        self.__worker: Optional[ProcessWorker] = None
+        self.__setup_progress()
+        self.__setup_watch()
+        self.__setup_preview()
         self.error_dialog = QtWidgets.QErrorMessage()  # For use later, if needed
         self.__setup_signal_capture()
+        # Only check for updates once the window is up, so a slow network can't hold it
+        QtCore.QTimer.singleShot(0, lambda: self.check_updates(at_start=True))
         logger.info("Main window set up")
 
     def __setup_buttons(self) -> None:
@@ -51,6 +65,142 @@ class MainWindow(QtWidgets.QMainWindow, mw.Ui_MainWindow):
         )
         logging.debug("Finished setting up buttons.")
 
+    def __setup_progress(self) -> None:
+        logging.debug("Setting up progress bar...")
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setTextVisible(True)
+        self.button_cancel = QtWidgets.QPushButton("Cancel")
+        self.button_cancel.clicked.connect(self._cancel_processing)
+        self.statusbar.addWidget(self.progress_bar, 1)
+        self.statusbar.addWidget(self.button_cancel)
+        self.__set_busy(False)
+
+    def __set_busy(self, busy: bool) -> None:
+        self.progress_bar.setVisible(busy)
+        self.button_cancel.setVisible(busy)
+        self.button_cancel.setEnabled(busy)
+        self.button_process.setEnabled(not busy)
+        if busy:
+            self.progress_bar.setValue(0)
+
+    def __setup_watch(self) -> None:
+        logging.debug("Setting up folder watching...")
+        self.action_watch_folder = QtWidgets.QAction("Watch Folder...", self)
+        self.action_watch_folder.setCheckable(True)
+        self.action_watch_folder.toggled.connect(self._toggle_watch)
+        self.menuFile.insertAction(self.actionExit, self.action_watch_folder)
+        self.menuFile.insertSeparator(self.actionExit)
+        self.file_watcher = QtCore.QFileSystemWatcher(self)
+        self.file_watcher.directoryChanged.connect(self.__on_watched_dir_changed)
+        # Polls again once changes have settled, so half-copied files are not read
+        self.watch_timer = QtCore.QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(int(WATCH_SETTLE_SECONDS * 1000))
+        self.watch_timer.timeout.connect(self.__poll_watched_dir)
+        # One thread, so that the ledger is only ever updated by one worker at a time
+        self.watch_pool = QtCore.QThreadPool(self)
+        self.watch_pool.setMaxThreadCount(1)
+        self.__folder_watcher: Optional[FolderWatcher] = None
+        self.__ledger: Optional[ProcessedLedger] = None
+
+    def __setup_preview(self) -> None:
+        # Both frames parse their file as soon as it is dropped; once both have, the
+        # share of students that will match is shown before anything is processed
+        self.frame_grade_csv.preloadFinished.connect(self.__show_match_preview)
+        self.frame_student_xlsx.preloadFinished.connect(self.__show_match_preview)
+
+    def __show_match_preview(self) -> None:
+        roster = self.frame_student_xlsx.preloaded()
+        grades = self.frame_grade_csv.preloaded()
+        if roster is None or grades is None:
+            return
+        from process import count_matches
+
+        found, students = count_matches(grades[1], roster)
+        if students:
+            self.statusbar.showMessage(
+                f"{found:,} of {students:,} students in the Teams export are in the "
+                f"student logins ({found / students:.0%})"
+            )
+
+    def _toggle_watch(self, checked: bool) -> None:
+        if not checked:
+            if self.file_watcher.directories():
+                logger.info(f"Stopped watching {self.file_watcher.directories()}")
+                self.file_watcher.removePaths(self.file_watcher.directories())
+            self.watch_timer.stop()
+            self.__folder_watcher = None
+            self.statusbar.showMessage("Stopped watching folder", 5000)
+            return
+        if not self.frame_student_xlsx.file_path.is_file():
+            QMessageBox.warning(
+                self,
+                "Student logins not loaded",
+                "Load the Student Logins file before watching a folder.",
+            )
+            self.action_watch_folder.setChecked(False)
+            return
+        options = QtWidgets.QFileDialog.Options()
+        options |= QtWidgets.QFileDialog.DontUseNativeDialog
+        options |= QtWidgets.QFileDialog.ShowDirsOnly
+        directory = QtWidgets.QFileDialog.getExistingDirectory(
+            self,
+            "Choose folder to watch for Teams files",
+            directory=str(Path().home()),
+            options=options,
+        )
+        if not directory:
+            self.action_watch_folder.setChecked(False)
+            return
+        if not self.text_output_dir.text():
+            self.choose_output_dir(directory)
+        output_dir = Path(self.text_output_dir.text())
+        logger.info(f"Watching {directory}, writing to {output_dir}")
+        self.__folder_watcher = FolderWatcher(Path(directory))
+        self.__ledger = ProcessedLedger(output_dir.joinpath(WATCH_LEDGER_NAME))
+        self.file_watcher.addPath(directory)
+        self.statusbar.showMessage(f"Watching {directory}")
+        self.__poll_watched_dir()
+
+    def __on_watched_dir_changed(self, directory: str) -> None:
+        logger.debug(f"Watched folder changed: {directory}")
+        self.watch_timer.start()  # Restarts the wait if already running
+
+    def __poll_watched_dir(self) -> None:
+        if self.__folder_watcher is None:
+            return
+        try:
+            files = self.__folder_watcher.poll()
+        except OSError as e:  # A network folder that has gone away, for now
+            logger.warning(f"Unable to read the watched folder: {e}")
+            self.watch_timer.start()
+            return
+        if files:
+            logger.info(f"New file(s) in watched folder: {[f.name for f in files]}")
+            worker = WatchWorker(
+                files=files,
+                student_list=self.frame_student_xlsx.file_path,
+                output_dir=self.__ledger.file.parent,
+                ledger=self.__ledger,
+            )
+            worker.signals.finished.connect(self.__on_watch_processed)
+            self.watch_pool.start(worker)
+        if self.__folder_watcher.pending:
+            self.watch_timer.start()
+
+    def __on_watch_processed(self, written: List[Path], failed: List[Path]) -> None:
+        from unmatched import summarize
+
+        msg = f"Watched folder: wrote {len(written)} file(s)"
+        unmatched = summarize(written)
+        if unmatched:
+            msg += f", {len(unmatched)} with unmatched students (see the reports)"
+        if failed:
+            msg += f", failed to process {', '.join(f.name for f in failed)}"
+        logger.info(msg)
+        self.statusbar.showMessage(msg, 10000)
+
     def __setup_signal_capture(self) -> None:
         logger.debug("Setting up signal capture")
         signal.signal(signal.SIGABRT, self.__signal_handler)
@@ -73,14 +223,21 @@ class MainWindow(QtWidgets.QMainWindow, mw.Ui_MainWindow):
             f"(located at {file_name.parent})"
         )
 
-    def check_updates(self, at_start: bool = False) -> str:
+    def check_updates(self, at_start: bool = False) -> None:
         logger.info("Checking for new version...")
-        ret: str = ""
-        version, link = check_updates.get_latest_ver()
+        worker = UpdateCheckWorker(force=not at_start)
+        worker.signals.finished.connect(
+            lambda version, link: self.__on_update_checked(version, link, at_start)
+        )
+        QtCore.QThreadPool.globalInstance().start(worker)
+
+    def __on_update_checked(
+        self, version: Tuple[int, ...], link: str, at_start: bool
+    ) -> None:
         version_str = f"v{'.'.join(map(str,version))}"
         update_available = check_updates.update_available(latest_ver=version)
         if update_available:
-            ret = f"(Update: {version_str})"
+            self.version_label.setText(f"Version: {VERSION} (Update: {version_str})")
             logger.info(f"New version available: {version_str}")
             response = QMessageBox.question(
                 self,
@@ -103,34 +260,114 @@ class MainWindow(QtWidgets.QMainWindow, mw.Ui_MainWindow):
                 "Check for Updates",
                 f"No update available.\nAlready running most recent version {VERSION}",
             )
-        return ret
 
     def __actual_process(self, output_file: Path) -> None:
-        generate_output(
-            assignment_file=self.frame_grade_csv.file_path,
-            student_list=self.frame_student_xlsx.file_path,
-            output=output_file,
+        self.__start_worker(
+            ProcessWorker(
+                assignment_file=self.frame_grade_csv.file_path,
+                student_list=self.frame_student_xlsx.file_path,
+                output=output_file,
+                grades=self.frame_grade_csv.preloaded(),
+            )
         )
-        msg = f"Finished creating {output_file.name} at {self.text_output_dir.text()}"
+
+    def __start_worker(self, worker: ProcessWorker) -> None:
+        logger.info("Starting processing in the background")
+        worker.signals.progress.connect(self.__on_progress)
+        worker.signals.finished.connect(self.__on_finished)
+        worker.signals.error.connect(self.__on_error)
+        worker.signals.cancelled.connect(self.__on_cancelled)
+        self.__worker = worker
+        self.__set_busy(True)
+        QtCore.QThreadPool.globalInstance().start(worker)
+
+    def _cancel_processing(self) -> None:
+        if self.__worker is not None:
+            self.button_cancel.setEnabled(False)
+            self.progress_bar.setFormat("Cancelling...")
+            self.__worker.cancel()
+
+    def __on_progress(self, stage: str, percent: int) -> None:
+        self.progress_bar.setValue(percent)
+        self.progress_bar.setFormat(f"{stage} (%p%)")
+
+    def __on_finished(self, written: List[Path]) -> None:
+        from unmatched import summarize
+
+        self.__worker = None
+        self.__set_busy(False)
+        if len(written) == 1:
+            msg = f"Finished creating {written[0].name} at {written[0].parent}"
+        else:
+            msg = f"Finished creating {len(written)} files at {written[0].parent}"
         logger.info(msg)
-        QMessageBox.information(self, "All done", msg)
+        summaries = summarize(written)
+        if summaries:
+            msg += "\n\nSome students could not be matched:\n"
+            msg += "\n".join(str(summary) for summary in summaries)
+            QMessageBox.warning(self, "Finished, with unmatched students", msg)
+        else:
+            QMessageBox.information(self, "All done", msg)
+
+    def __on_error(self, error: str) -> None:
+        self.__worker = None
+        self.__set_busy(False)
+        QMessageBox.critical(self, "Processing failed", f"Unable to process:\n{error}")
+
+    def __on_cancelled(self) -> None:
+        self.__worker = None
+        self.__set_busy(False)
+        self.statusbar.showMessage("Processing cancelled", 5000)
+
+    def __process_all(self) -> None:
+        output_dir = Path(self.text_output_dir.text())
+        file_names = self.frame_grade_csv.export.file_names()
+        existing = [
+            name for name in file_names if output_dir.joinpath(f"{name}.xlsx").exists()
+        ]
+        if existing:
+            logger.info(f"{len(existing)} output file(s) already exist!")
+            response = QMessageBox.question(
+                self,
+                "Output Files Exist",
+                f"{len(existing)} of the {len(file_names)} files to be written already "
+                f"exist in {output_dir}.\n"
+                f"Overwrite them?",
+            )
+            logger.debug(f"Response: {response}")
+            if response != QMessageBox.Yes:
+                return
+        self.__start_worker(
+            ProcessWorker(
+                assignment_file=self.frame_grade_csv.file_path,
+                student_list=self.frame_student_xlsx.file_path,
+                output_dir=output_dir,
+                grades=self.frame_grade_csv.preloaded(),
+            )
+        )
 
     def _process_files(self) -> None:
         logging.info("Processing files")
+        if self.__worker is not None:
+            logging.info("Already processing, ignoring")
+            return
         if (
             self.frame_grade_csv.file_path.is_file()
             and self.frame_student_xlsx.file_path.is_file()
         ):
             logging.info("Both files are selected")
+            if len(self.frame_grade_csv.export) > 1:
+                logging.info(f"{len(self.frame_grade_csv.export)} assignments in file")
+                self.__process_all()
+                return
             logging.debug(
                 f"self.frame_grade_csv.file_path: {self.frame_grade_csv.file_path}\n"
-                f"self.frame_grade_csv.assignment_file_name: {self.frame_grade_csv.assignment_file_name}\n"
+                f"self.frame_grade_csv.export: {self.frame_grade_csv.export}\n"
                 f"self.frame_student_xlsx.file_path: {self.frame_student_xlsx.file_path}\n"
-                f"Output: {Path(self.text_output_dir.text()).joinpath(self.frame_grade_csv.assignment_file_name)}.xlsx"
             )
             # Both files loaded, good
             output_file = Path(self.text_output_dir.text()).joinpath(
-                f"{self.frame_grade_csv.assignment_file_name}.xlsx"
+                f"{self.frame_grade_csv.export.latest.file_name}.xlsx"
             )
             if output_file.exists():
                 logger.info("Output File already exists!")
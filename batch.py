@@ -0,0 +1,288 @@
+import logging
+import os
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
+
+import constants
+import profiling
+from constants import DEFAULT_WRITER
+from helpers import file_hash, valid_extension
+from manifest import OutputManifest
+from model import TeamsExport, class_period
+from process import generate_outputs, generate_workbook, stream_outputs
+from roster import StudentRoster, load_rosters
+from scaling import NO_SCALE, GradeScale, validate
+from sniff import sniff
+from writers import output_suffix
+
+# Headless processing of many Teams exports at once. Nothing in here (or in what it
+# imports) may pull in PyQt5, so that it can run on servers without a display.
+
+logger = logging.getLogger(__name__)
+
+
+def find_teams_files(directory: Path) -> List[Path]:
+    """
+    Find every Teams grade CSV in a directory that can be processed
+
+    A file is accepted if its contents show it to be a Teams export (see sniff.sniff)
+    and it has the "P0x" class period in its name (see process.class_period).
+
+    :param directory: Path
+    :return: List[Path], sorted by name
+    """
+    logger.debug(f"Searching for Teams files in {directory}")
+    found: List[Path] = []
+    for file in sorted(directory.iterdir()):
+        if not file.is_file() or not valid_extension(file):
+            continue
+        if not sniff(file).is_teams:
+            logger.debug(f"Skipping file that is not a Teams export: {file.name}")
+            continue
+        try:
+            class_period(file)
+        except ValueError:
+            logger.warning(f"Skipping file without a class period: {file.name}")
+            continue
+        found.append(file)
+    logger.info(f"Found {len(found)} Teams file(s) in {directory}")
+    return found
+
+
+class BatchResult(NamedTuple):
+    written: List[Path]  # Output files written
+    failed: List[Path]  # Teams CSVs that could not be processed
+    skipped: List[Path]  # Output files already up to date
+
+
+def process_directory(
+    directory: Path,
+    student_list: Union[Path, Sequence[Path]],
+    output_dir: Path,
+    stream: bool = False,
+    chunk_rows: int = constants.STREAM_CHUNK_ROWS,
+    writer: str = DEFAULT_WRITER,
+    workers: int = 1,
+    force: bool = False,
+    scale: GradeScale = NO_SCALE,
+    workbook: Optional[str] = None,
+) -> BatchResult:
+    """
+    Create an ATLAS file for every Teams grade CSV in a directory
+
+    A file that fails to process is logged and skipped, so one bad export does not stop
+    the rest of the batch. Output names are planned up front, in file name order, so
+    they are the same whatever the number of workers.
+
+    Unless force is set, a CSV is skipped if the manifest in output_dir shows it was
+    already processed from the same CSV and roster contents, by the same version and
+    with the same options, and its outputs are all still there.
+
+    With workbook set, every assignment of every CSV is written as a sheet of that one
+    workbook instead (see process.generate_workbook), in this process. It is rebuilt
+    as a whole if any CSV has changed, failed last time, or the CSVs found are not the
+    same as last time; a CSV that fails is left out of it.
+
+    :param directory: Path
+    :param student_list: Union[Path, Sequence[Path]], one or more student logins files
+    :param output_dir: Path
+    :param stream: bool, read each CSV in chunks (see process.stream_outputs)
+    :param chunk_rows: int, CSV rows per chunk when streaming
+    :param writer: str, output backend when not streaming, one of writers.WRITERS
+    :param workers: int, processes to use; 1 runs in this process, 0 uses every CPU
+    :param force: bool, process every CSV even if its outputs are up to date
+    :param scale: GradeScale, applied to the points before they are written
+    :param workbook: Optional[str], file name in output_dir to write every sheet to
+    :return: BatchResult
+    """
+    logger.info(f"Batch processing {directory} into {output_dir}")
+    validate(scale)  # Before anything is loaded, rather than once for every file
+    output_dir.mkdir(parents=True, exist_ok=True)
+    roster = load_rosters(student_list)
+    options = {
+        "stream": stream,
+        "chunk_rows": chunk_rows,
+        "writer": writer,
+        "scale": scale._asdict(),
+    }
+    manifest = OutputManifest(output_dir)
+    full_plan, failed = plan_outputs(find_teams_files(directory))
+    if workbook is not None:
+        # Any CSV added or removed changes what belongs in the workbook
+        options["workbook"] = workbook
+        options["sources"] = [file.name for file, _ in full_plan]
+    plan: List[Tuple[Path, List[str]]] = []
+    source_hashes: Dict[Path, str] = {}
+    skipped: List[Path] = []
+    for file, file_names in full_plan:
+        if workbook is not None:
+            outputs = [output_dir.joinpath(workbook)]
+        else:
+            outputs = _output_paths(output_dir, file_names, writer)
+        try:
+            with profiling.stage("batch.hash"):
+                source_hashes[file] = file_hash(file)
+        except OSError as e:
+            logger.error(f"Failed to read {file.name}: {e}")
+            failed.append(file)
+            continue
+        if not force and manifest.is_current(
+            file, source_hashes[file], roster.content_hash, options, outputs
+        ):
+            logger.info(f"Outputs up to date, skipping: {file.name}")
+            skipped.extend(outputs)
+            continue
+        plan.append((file, file_names))
+    written: List[Path] = []
+
+    def record(file: Path, outputs: List[Path]) -> None:
+        written.extend(outputs)
+        manifest.record(
+            file, source_hashes[file], roster.content_hash, options, outputs
+        )
+
+    workers = workers or os.cpu_count() or 1
+    if workbook is not None:
+        output = output_dir.joinpath(workbook)
+        if plan:
+            # Every sheet is rewritten, so every file is part of the plan again
+            files = [file for file, _ in full_plan if file in source_hashes]
+            skipped = []
+            try:
+                left_out = generate_workbook(
+                    assignment_files=files, roster=roster, output=output, scale=scale
+                )
+            except Exception as e:
+                logger.error(f"Failed to write {output.name}: {e}")
+                failed.extend(files)
+            else:
+                failed.extend(left_out)  # Recorded as failed, so retried next time
+                for file in (file for file in files if file not in left_out):
+                    manifest.record(
+                        file,
+                        source_hashes[file],
+                        roster.content_hash,
+                        options,
+                        [output],
+                    )
+                written.append(output)
+        else:
+            skipped = skipped[:1]  # The one workbook, not once for every CSV
+    elif workers == 1 or len(plan) <= 1:
+        for file, file_names in plan:
+            try:
+                outputs = _process_file(file, file_names, roster, output_dir, options)
+            except Exception as e:
+                logger.error(f"Failed to process {file.name}: {e}")
+                failed.append(file)
+            else:
+                record(file, outputs)
+    else:
+        logger.info(f"Processing {len(plan)} files with {workers} workers")
+        # The roster is sent to each worker once, by the initializer, not with every file
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(plan)),
+            initializer=_init_worker,
+            initargs=(roster, profiling.is_enabled(), tracemalloc.is_tracing()),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _process_in_worker, file, file_names, output_dir, options
+                )
+                for file, file_names in plan
+            ]
+            for (file, _), future in zip(plan, futures):
+                try:
+                    outputs, timings = future.result()
+                    profiling.extend(timings)
+                except Exception as e:
+                    logger.error(f"Failed to process {file.name}: {e}")
+                    failed.append(file)
+                else:
+                    record(file, outputs)
+    manifest.save()
+    logger.info(
+        f"Batch finished: {len(written)} written, {len(skipped)} up to date, "
+        f"{len(failed)} failed"
+    )
+    return BatchResult(written=written, failed=failed, skipped=skipped)
+
+
+def _output_paths(output_dir: Path, file_names: List[str], writer: str) -> List[Path]:
+    suffix = output_suffix(writer)
+    return [output_dir.joinpath(f"{file_name}{suffix}") for file_name in file_names]
+
+
+def plan_outputs(
+    files: List[Path],
+) -> Tuple[List[Tuple[Path, List[str]]], List[Path]]:
+    """
+    Decide the output file names for every assignment of every file
+
+    Names come from model.assignment_file_name, made unique across the whole batch.
+
+    :param files: List[Path]
+    :return: Tuple[List[Tuple[Path, List[str]]], List[Path]], (file, output names) for
+             each readable file, and the files whose header could not be read
+    """
+    taken: Set[str] = set()
+    plan: List[Tuple[Path, List[str]]] = []
+    failed: List[Path] = []
+    for file in files:
+        try:
+            export = TeamsExport.from_file(file)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read {file.name}: {e}")
+            failed.append(file)
+            continue
+        plan.append((file, export.file_names(taken=taken)))
+    return plan, failed
+
+
+def _process_file(
+    file: Path,
+    file_names: List[str],
+    roster: StudentRoster,
+    output_dir: Path,
+    options: Dict[str, Any],
+) -> List[Path]:
+    if options["stream"]:
+        return stream_outputs(
+            assignment_file=file,
+            roster=roster,
+            output_dir=output_dir,
+            chunk_rows=options["chunk_rows"],
+            file_names=file_names,
+            scale=GradeScale(**options["scale"]),
+            writer=options["writer"],
+        )
+    return generate_outputs(
+        assignment_file=file,
+        roster=roster,
+        output_dir=output_dir,
+        writer=options["writer"],
+        file_names=file_names,
+        scale=GradeScale(**options["scale"]),
+    )
+
+
+# Roster for the current worker process, set once by _init_worker
+_worker_roster: Optional[StudentRoster] = None
+
+
+def _init_worker(roster: StudentRoster, profile: bool, trace_memory: bool) -> None:
+    global _worker_roster
+    _worker_roster = roster
+    profiling.collect()  # Drop any timings inherited from the parent by fork
+    if profile:
+        profiling.enable(trace_memory=trace_memory)
+
+
+def _process_in_worker(
+    file: Path, file_names: List[str], output_dir: Path, options: Dict[str, Any]
+) -> Tuple[List[Path], List[profiling.StageTiming]]:
+    # Stage timings are sent back with the outputs, to be added to the parent's
+    outputs = _process_file(file, file_names, _worker_roster, output_dir, options)
+    return outputs, profiling.collect()
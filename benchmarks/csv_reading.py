@@ -0,0 +1,71 @@
+import argparse
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+# Benchmark of reading Teams exports
+#
+# Compares process.read_grades, which maps each CSV into memory once and reads the
+# header and body from the mapping, against the way it used to read them: the header
+# with model.assignment_names, then the whole file again with pd.read_csv. Timed for
+# a batch of many small exports (where opening and re-reading dominate) and for one
+# large one.
+#
+# Run from the repository root:
+#   python benchmarks/csv_reading.py [--files 1000] [--students 30] [--large 100000]
+
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from model import assignment_names  # noqa: E402
+from process import _long_grades, read_grades  # noqa: E402
+from synthetic import write_teams_csv  # noqa: E402
+
+
+def read_twice(file: Path) -> None:
+    # read_grades as it was, opening and reading the file twice
+    names = assignment_names(file)
+    raw = pd.read_csv(file, header=None, skiprows=1)
+    _long_grades(raw, len(names))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark reading Teams exports")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--large", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        files: List[Path] = []
+        for i in range(args.files):
+            files.append(Path(directory).joinpath(f"grades P01 {i}.csv"))
+            write_teams_csv(files[-1], args.students, assignments=3, seed=i)
+        large = Path(directory).joinpath("grades P01 large.csv")
+        write_teams_csv(large, args.large, assignments=5)
+
+        def best(statement) -> float:
+            return min(timeit.repeat(statement, number=1, repeat=args.repeat))
+
+        print(
+            f"{args.files} exports of {args.students} students (best of {args.repeat})"
+        )
+        twice = best(lambda: [read_twice(file) for file in files])
+        mapped = best(lambda: [read_grades(file) for file in files])
+        print(f"  header, then read_csv: {twice * 1000 / args.files:8.3f} ms per file")
+        print(f"  one mapping:           {mapped * 1000 / args.files:8.3f} ms per file")
+        print(f"{args.large:,} students x 5 assignments")
+        twice = best(lambda: read_twice(large))
+        mapped = best(lambda: read_grades(large))
+        print(f"  header, then read_csv: {twice * 1000:8.1f} ms")
+        print(f"  one mapping:           {mapped * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+# End-to-end benchmark of process.generate_output, with per-stage timings
+#
+# For each size, synthetic inputs are generated (see synthetic.py) and
+# generate_output is timed three ways:
+#   cold    the first run, which parses the Student Portal workbook
+#   cached  after the workbook's mtime changes, so it is reloaded from the roster cache
+#   warm    again, reusing the roster already loaded in this process
+# For multi-assignment exports generate_outputs (every assignment) is timed as well.
+# The stages come from the profiling module, as with cli.py --profile.
+#
+# Run from the repository root:
+#   python benchmarks/pipeline.py [--students 100 10000 100000] [--json results.json]
+# --json appends this run's results to a file, to track performance over time.
+
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import profiling  # noqa: E402
+from constants import VERSION  # noqa: E402
+from synthetic import write_student_portal, write_teams_csv  # noqa: E402
+
+
+def timed(run: Callable[[], Any]) -> Tuple[Dict[str, Any], str]:
+    # The time taken and every stage, and a summary table of the stages
+    profiling.collect()
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    records = profiling.collect()
+    stages = [record.as_dict() for record in records]
+    return {"seconds": seconds, "stages": stages}, profiling.summary(records)
+
+
+def bench_size(directory: Path, students: int, assignments: int) -> Dict[str, Any]:
+    """Generate inputs of one size and time every mode, printing the results"""
+    from process import generate_output, generate_outputs
+    from roster import load_roster
+
+    roster_file = directory.joinpath(f"Student Portal {students}.xlsx")
+    teams_file = directory.joinpath(f"grades P01 {students}x{assignments}.csv")
+    output_dir = directory.joinpath("out")
+    output_dir.mkdir(exist_ok=True)
+    write_student_portal(roster_file, students)
+    write_teams_csv(teams_file, students, assignments=assignments)
+
+    def run() -> None:
+        generate_output(teams_file, roster_file, output_dir.joinpath("output.xlsx"))
+
+    results: Dict[str, Any] = {}
+    results["cold"], cold_stages = timed(run)
+    stat = roster_file.stat()
+    os.utime(roster_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    results["cached"], _ = timed(run)
+    results["warm"], _ = timed(run)
+    if assignments > 1:
+        roster = load_roster(roster_file)
+        results["all assignments"], _ = timed(
+            lambda: generate_outputs(teams_file, roster, output_dir)
+        )
+    print_results(students, assignments, results, cold_stages)
+    return {"students": students, "assignments": assignments, **results}
+
+
+def print_results(
+    students: int, assignments: int, results: Dict[str, Any], cold_stages: str
+) -> None:
+    print(f"\n{students:,} students x {assignments} assignment(s)")
+    for mode in ("cold", "cached", "warm", "all assignments"):
+        if mode in results:
+            print(f"  {mode:<16} {results[mode]['seconds']:8.3f} s")
+    print("  Stages of the cold run:")
+    for line in cold_stages.splitlines():
+        print(f"    {line}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark generate_output")
+    parser.add_argument(
+        "--students", type=int, nargs="+", default=[100, 10_000, 100_000]
+    )
+    parser.add_argument(
+        "--assignments",
+        type=int,
+        nargs="+",
+        default=[1, 5],
+        help="Assignments per export, 1 for single-assignment files",
+    )
+    parser.add_argument(
+        "--memory", action="store_true", help="Measure peak memory (slower)"
+    )
+    parser.add_argument("--json", type=Path, help="Append the results to this file")
+    args = parser.parse_args()
+
+    profiling.enable(trace_memory=args.memory)
+    runs: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as directory:
+        for students in args.students:
+            for assignments in args.assignments:
+                runs.append(bench_size(Path(directory), students, assignments))
+
+    if args.json is not None:
+        history: List[Dict[str, Any]] = []
+        if args.json.is_file():
+            with open(args.json, "r") as f:
+                history = json.load(f)
+        history.append({"time": time.time(), "version": VERSION, "runs": runs})
+        with open(args.json, "w") as f:
+            json.dump(history, f, indent=1)
+        print(f"\nResults added to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+# Benchmark of reading the Student Portal logins workbook
+#
+# Compares pd.read_excel(**constants.STUDENT_LOGINS), which builds a frame of every
+# column before keeping two, against roster.read_logins, which streams just the wanted
+# columns with openpyxl in read-only mode. Each runs in a fresh interpreter on the
+# same synthetic workbook, so that peak RSS is measured separately.
+# Peak RSS comes from the resource module, so this only runs on Linux/macOS.
+#
+# Run from the repository root:
+#   python benchmarks/roster_loading.py [--students 50000]
+
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+LOADERS = ["read_excel", "read_logins"]
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def run_one(loader: str, file: Path) -> Dict[str, float]:
+    import openpyxl  # noqa: F401, imported up front so it isn't part of the time
+    import pandas as pd
+
+    import constants
+    from roster import read_logins
+
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    if loader == "read_excel":
+        students = pd.read_excel(file, **constants.STUDENT_LOGINS)
+    else:
+        students = read_logins(file)
+    elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "rows": len(students),
+        "peak_rss_mb": peak_rss_mb() - before,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark reading student logins")
+    parser.add_argument("--students", type=int, default=50_000)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_one(args.child[0], Path(args.child[1]))))
+        return 0
+
+    from synthetic import write_student_portal
+
+    with tempfile.TemporaryDirectory() as directory:
+        file = Path(directory).joinpath("Student Portal.xlsx")
+        write_student_portal(file, args.students)
+        print(f"{args.students} students")
+        print(f"{'loader':<12} {'seconds':>8} {'rows/sec':>10} {'+RSS MB':>8}")
+        for loader in LOADERS:
+            result = subprocess.run(
+                [sys.executable, __file__, "--child", loader, str(file)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            stats = json.loads(result.stdout.splitlines()[-1])
+            print(
+                f"{loader:<12} {stats['seconds']:>8.2f} "
+                f"{stats['rows'] / stats['seconds']:>10.0f} {stats['peak_rss_mb']:>8.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
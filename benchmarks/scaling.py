@@ -0,0 +1,79 @@
+import argparse
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Micro-benchmark of grade scaling
+#
+# Compares scaling.scale_grades, which works on whole columns of the long grades table
+# at once, against the same scale applied one row at a time with DataFrame.apply.
+# The grades are read from a synthetic Teams export with process.read_grades, so every
+# assignment of the export is scaled in the one pass.
+#
+# Run from the repository root:
+#   python benchmarks/scaling.py [--students 100000] [--assignments 5]
+
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from process import read_grades  # noqa: E402
+from scaling import GradeScale, scale_grades  # noqa: E402
+from synthetic import write_teams_csv  # noqa: E402
+
+
+def scale_row(row: pd.Series, scale: GradeScale) -> float:
+    # The same scale as scale_grades, for one row
+    points, total = row["Points"], row["Total"]
+    if scale.target is not None:
+        if not total > 0:
+            return np.nan
+        points, total = points * scale.target / total, scale.target
+    if scale.clamp and not np.isnan(points):
+        points = max(0.0, min(points, total)) if not np.isnan(total) else max(0, points)
+    if scale.decimals is not None and not np.isnan(points):
+        points = float(round(points, scale.decimals))
+    return points
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark grade scaling")
+    parser.add_argument("--students", type=int, default=100_000)
+    parser.add_argument("--assignments", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        file = Path(directory).joinpath("grades P01.csv")
+        write_teams_csv(file, args.students, assignments=args.assignments)
+        _, grades = read_grades(file)
+
+    def best(statement, repeat: int = args.repeat) -> float:
+        return min(timeit.repeat(statement, number=1, repeat=repeat)) * 1000
+
+    print(f"{len(grades):,} grades ({args.students:,} students x {args.assignments})")
+    print(f"  {'scale':<42} {'columns':>10} {'per row':>10} {'speedup':>8}")
+    for scale in (
+        GradeScale(percent=True),
+        GradeScale(percent=True, decimals=0, clamp=True),
+        GradeScale(points=10, decimals=1),
+    ):
+        vectorized_ms = best(lambda: scale_grades(grades, scale))
+        per_row_ms = best(lambda: grades.apply(scale_row, axis=1, scale=scale), 1)
+        description = ", ".join(
+            f"{field}={value}"
+            for field, value in scale._asdict().items()
+            if value is not None and value is not False
+        )
+        print(
+            f"  {description:<42} {vectorized_ms:8.1f}ms {per_row_ms:8.0f}ms "
+            f"{per_row_ms / vectorized_ms:7.0f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
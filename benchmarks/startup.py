@@ -0,0 +1,138 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Startup benchmark for the GUI.
+#
+# Measures two things, each as the median over several fresh interpreters:
+#   * import time of TeamsAtlasBridge, from `python -X importtime`
+#   * time from launching the interpreter until the main window has been shown
+# and fails (exit code 1) if either is over its threshold, or if any module that
+# should only be loaded once a file is processed is imported at startup.
+#
+# Run from the repository root:
+#   python benchmarks/startup.py [--runs 5] [--max-import-ms 400] [--max-window-ms 1500]
+
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+
+# Heavy dependencies that must not be imported before a file is dropped or processed
+LAZY_MODULES: List[str] = ["pandas", "numpy", "openpyxl", "requests"]
+
+WINDOW_SNIPPET: str = """
+import sys
+from PyQt5.QtWidgets import QApplication
+import TeamsAtlasBridge
+app = QApplication(sys.argv)
+form = TeamsAtlasBridge.MainWindow()
+form.show()
+app.processEvents()
+print("WINDOW_SHOWN", flush=True)
+"""
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_importtime() -> Dict[str, Tuple[int, int]]:
+    """
+    Import TeamsAtlasBridge in a fresh interpreter
+
+    :return: Dict[str, Tuple[int, int]], module -> (self, cumulative) microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import TeamsAtlasBridge"],
+        cwd=REPO_ROOT,
+        env=_environment(),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules: Dict[str, Tuple[int, int]] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            modules[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return modules
+
+
+def run_window() -> float:
+    """
+    Launch a fresh interpreter and wait for the main window to be shown
+
+    :return: float, milliseconds
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", WINDOW_SNIPPET],
+        cwd=REPO_ROOT,
+        env=_environment(),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    for line in process.stdout:
+        if line.startswith("WINDOW_SHOWN"):
+            elapsed = (time.perf_counter() - start) * 1000
+            break
+    else:
+        process.wait()
+        raise RuntimeError(f"Window was never shown (exit code {process.returncode})")
+    process.kill()
+    process.wait()
+    return elapsed
+
+
+def _environment() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")  # Works without a display
+    return env
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Startup benchmark for the GUI")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=400.0)
+    parser.add_argument("--max-window-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to show")
+    parser.add_argument(
+        "--no-window", action="store_true", help="Only measure import time"
+    )
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    import_runs = [run_importtime() for _ in range(args.runs)]
+    import_ms = statistics.median(
+        runs["TeamsAtlasBridge"][1] / 1000 for runs in import_runs
+    )
+    print(f"Import time (median of {args.runs}): {import_ms:.1f} ms")
+    print("Slowest imports (cumulative):")
+    for name, (_, cumulative) in sorted(
+        import_runs[-1].items(), key=lambda item: item[1][1], reverse=True
+    )[: args.top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    if import_ms > args.max_import_ms:
+        failures.append(f"import time {import_ms:.1f} ms > {args.max_import_ms} ms")
+    loaded = [name for name in LAZY_MODULES if name in import_runs[-1]]
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+
+    if not args.no_window:
+        window_ms = statistics.median(run_window() for _ in range(args.runs))
+        print(f"Time to first window (median of {args.runs}): {window_ms:.1f} ms")
+        if window_ms > args.max_window_ms:
+            failures.append(
+                f"time to first window {window_ms:.1f} ms > {args.max_window_ms} ms"
+            )
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
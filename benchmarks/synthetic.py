@@ -0,0 +1,132 @@
+import argparse
+import csv
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from openpyxl import Workbook
+
+# Generators of realistic synthetic inputs, for the benchmarks
+#
+# write_student_portal makes a Student Portal logins workbook laid out as
+# constants.STUDENT_LOGINS expects: three rows of title above the header row, extra
+# columns around StuID and Username, and usernames that are full email addresses.
+# write_teams_csv makes a Teams grades export with one or more assignments, every
+# value quoted, and feedback in Teams' ="..." form (with commas and quotes in it).
+# The data is seeded, so the same arguments always give the same files.
+#
+# Can also be run on its own to make inputs for trying things out by hand:
+#   python benchmarks/synthetic.py <folder> [--students 10000] [--assignments 5]
+
+DOMAIN: str = "school.example"
+FEEDBACK: List[str] = [
+    "",
+    "Nice",
+    "Good work, see me about question 3",
+    'Re-read the "Methods" section',
+    "Late, -2",
+]
+
+
+def username(student: int) -> str:
+    return f"student{student}"
+
+
+def write_student_portal(
+    file: Path, students: int, title: Optional[str] = None, seed: int = 0
+) -> None:
+    """
+    Write a Student Portal logins workbook
+
+    :param file: Path, .xlsx
+    :param students: int
+    :param title: Optional[str], text of the first title row; by default it includes
+                  the current time, so that each file has different contents
+    :param seed: int
+    :return: None
+    """
+    rng = np.random.default_rng(seed)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Student Logins")
+    sheet.append([title or f"Student Portal Logins, generated {time.time()}"])
+    sheet.append(["Synthetic High School"])
+    sheet.append([])
+    sheet.append(
+        [None, "Line", "Teacher", "Period", "StuID", "Grade", "Name", "Username"]
+        + ["Password"]
+    )
+    grades = rng.integers(9, 13, students)
+    for i in range(students):
+        sheet.append(
+            [None, i + 1, "Teacher", 1 + i % 7, 100000 + i, int(grades[i])]
+            + [f"Last{i}, First{i}", f"{username(i)}@{DOMAIN}", f"pw{i:06d}"]
+        )
+    workbook.save(file)
+
+
+def write_teams_csv(
+    file: Path,
+    students: int,
+    assignments: int = 1,
+    unmatched: float = 0.02,
+    missing: float = 0.05,
+    seed: int = 0,
+) -> None:
+    """
+    Write a Teams grades export
+
+    :param file: Path, .csv; put "P0x" in the name for the class period
+    :param students: int, rows in the export
+    :param assignments: int, most recent first, named "Assignment N"
+    :param unmatched: float, fraction of students not in the Student Portal workbook
+    :param missing: float, fraction of grades left blank (not handed in)
+    :param seed: int
+    :return: None
+    """
+    rng = np.random.default_rng(seed)
+    header = ["First Name", "Last Name", "Email Address"]
+    for number in range(assignments, 0, -1):
+        header += [f"Assignment {number}", "Points", "Feedback"]
+    extra = rng.random(students) < unmatched
+    totals = rng.choice([10, 20, 50, 100], assignments)
+    with open(file, "w", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(header)
+        for i in range(students):
+            student = students * 10 + i if extra[i] else i  # Not in the roster
+            row = [f"First{i}", f"Last{i}", f"{username(student)}@{DOMAIN}"]
+            points = rng.integers(0, totals + 1)
+            blank = rng.random(assignments) < missing
+            comments = rng.integers(0, len(FEEDBACK), assignments)
+            for a in range(assignments):
+                feedback = FEEDBACK[comments[a]]
+                row += [
+                    "" if blank[a] else str(points[a]),
+                    str(totals[a]),
+                    f'="{feedback}"' if feedback else "",
+                ]
+            writer.writerow(row)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Write synthetic input files")
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--assignments", type=int, default=5)
+    parser.add_argument("--period", type=int, default=1)
+    args = parser.parse_args()
+
+    args.directory.mkdir(parents=True, exist_ok=True)
+    roster = args.directory.joinpath("Student Portal.xlsx")
+    teams = args.directory.joinpath(f"grades P0{args.period} export.csv")
+    write_student_portal(roster, args.students)
+    write_teams_csv(teams, args.students, assignments=args.assignments)
+    print(roster)
+    print(teams)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
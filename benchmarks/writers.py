@@ -0,0 +1,120 @@
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Benchmark of the ATLAS output backends in writers.py
+#
+# Each backend writes the same synthetic output (an assignment's points plus StuID,
+# with a few blanks) in a fresh interpreter, so that peak RSS is measured separately
+# for each one. Reports rows/sec and the peak RSS added by writing.
+# Peak RSS comes from the resource module, so this only runs on Linux/macOS.
+#
+# Then, for a section's worth of small outputs, compares writing each to its own file
+# with every backend against writing them all as sheets of one workbook
+# (writers.SheetsWorkbook), where the fixed cost of a workbook is paid once.
+#
+# Run from the repository root:
+#   python benchmarks/writers.py [--rows 10000 100000] [--outputs 50 --students 30]
+
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def output_frame(rows: int, seed: int = 0):
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    points = rng.integers(0, 21, rows).astype(float)
+    points[rng.random(rows) < 0.05] = np.nan  # Some missing grades
+    return pd.DataFrame(
+        {"Unit 1 Quiz": points, "StuID": np.arange(100000, 100000 + rows)}
+    )
+
+
+def run_one(writer: str, rows: int) -> Dict[str, float]:
+    from writers import output_suffix, write_output
+
+    frame = output_frame(rows)
+    before = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        output = Path(directory).joinpath(f"output{output_suffix(writer)}")
+        write_output(frame, output, writer=writer)
+        elapsed = time.perf_counter() - start
+    return {
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed,
+        "peak_rss_mb": peak_rss_mb() - before,
+    }
+
+
+def main() -> int:
+    from constants import WRITERS
+
+    parser = argparse.ArgumentParser(description="Benchmark ATLAS output backends")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--writers", nargs="+", choices=WRITERS, default=WRITERS)
+    parser.add_argument("--outputs", type=int, default=50)
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_one(args.child[0], int(args.child[1]))))
+        return 0
+
+    print(f"{'writer':<10} {'rows':>8} {'seconds':>8} {'rows/sec':>10} {'+RSS MB':>8}")
+    for rows in args.rows:
+        for writer in args.writers:
+            result = subprocess.run(
+                [sys.executable, __file__, "--child", writer, str(rows)],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            stats = json.loads(result.stdout.splitlines()[-1])
+            print(
+                f"{writer:<10} {rows:>8} {stats['seconds']:>8.2f} "
+                f"{stats['rows_per_sec']:>10.0f} {stats['peak_rss_mb']:>8.1f}"
+            )
+    section(args.outputs, args.students, args.writers)
+    return 0
+
+
+def section(outputs: int, students: int, writers: List[str]) -> None:
+    from writers import SheetsWorkbook, output_suffix, write_output
+
+    frames = [output_frame(students, seed) for seed in range(outputs)]
+    print(f"\n{outputs} outputs of {students} students")
+    with tempfile.TemporaryDirectory() as directory:
+        for writer in writers:
+            start = time.perf_counter()
+            for index, frame in enumerate(frames):
+                output = Path(directory).joinpath(f"{index}{output_suffix(writer)}")
+                write_output(frame, output, writer=writer)
+            elapsed = time.perf_counter() - start
+            print(f"  {writer + ', a file each':<24} {elapsed * 1000:8.1f} ms")
+        start = time.perf_counter()
+        workbook = SheetsWorkbook(Path(directory).joinpath("section.xlsx"))
+        for index, frame in enumerate(frames):
+            workbook.add_frame(str(index), frame)
+        workbook.save()
+        elapsed = time.perf_counter() - start
+        print(f"  {'one workbook, sheets':<24} {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,44 @@
+import json
 import logging
-from typing import Tuple, NewType
-
-import requests
-from requests.exceptions import HTTPError, ConnectionError, Timeout, RequestException
+import time
+from pathlib import Path
+from typing import Optional, Tuple, NewType
 
+from constants import UPDATE_CHECK_INTERVAL, UPDATE_CHECK_TIMEOUT
 from constants import VERSION as CURRENT_VERSION
+from helpers import user_data_dir
+
+# Nothing in this module may do any I/O at import time: the check itself is run in the
+# background once the window is shown, and its result is cached on disk for a day.
+# requests is only imported when a check is actually made, as it is slow to import.
 
 logger = logging.getLogger(__name__)
 
+LATEST_RELEASE_URL: str = (
+    "https://api.github.com/repos/dylarm/TeamsAtlasBridge/releases/latest"
+)
+
 
 Version = NewType("Version", Tuple[int, ...])
 
 
 def get_latest_ver(
-    url: str = "https://api.github.com/repos/dylarm/TeamsAtlasBridge/releases/latest"
+    url: str = LATEST_RELEASE_URL, timeout: float = UPDATE_CHECK_TIMEOUT
 ) -> Tuple[Version, str]:
     latest_version: Version = Version(
         (0, 0, 0)
     )  # Will always cause version check to be false if not updated
     latest_url: str = ""
+    import requests
+    from requests.exceptions import (
+        HTTPError,
+        ConnectionError,
+        Timeout,
+        RequestException,
+    )
+
     try:
-        response = requests.get(url)
+        response = requests.get(url, timeout=timeout)
         response.raise_for_status()  # For any HTTP Errors
         latest_version = Version(
             tuple(int(x) for x in response.json()["tag_name"].lstrip("v").split("."))
@@ -34,11 +52,67 @@ def get_latest_ver(
         logger.warning(
             f"A potentially serious error occurred while checking for updates:\n{e}"
         )
+    except (ValueError, KeyError, AttributeError) as e:
+        logger.warning(f"Unexpected response while checking for updates:\n{e}")
+    return latest_version, latest_url
+
+
+def default_cache_file() -> Path:
+    return user_data_dir().joinpath("update_check.json")
+
+
+def cached_latest_ver(
+    url: str = LATEST_RELEASE_URL,
+    timeout: float = UPDATE_CHECK_TIMEOUT,
+    cache_file: Optional[Path] = None,
+    max_age: float = UPDATE_CHECK_INTERVAL,
+    force: bool = False,
+) -> Tuple[Version, str]:
+    """
+    Get the latest version, asking GitHub at most once every max_age seconds
+
+    Only successful checks are cached, so a failed one is retried next time.
+
+    :param url: str
+    :param timeout: float, seconds to wait for GitHub
+    :param cache_file: Optional[Path], defaults to default_cache_file()
+    :param max_age: float, seconds a cached result stays valid
+    :param force: bool, ignore any cached result
+    :return: Tuple[Version, str], the latest version and its download page
+    """
+    cache_file = cache_file or default_cache_file()
+    if not force:
+        try:
+            with open(cache_file, "r") as f:
+                cached = json.load(f)
+            if cached["url"] == url and time.time() - cached["checked"] < max_age:
+                logger.debug(f"Using cached update check from {cache_file}")
+                return Version(tuple(cached["version"])), cached["link"]
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.debug("No usable cached update check")
+    latest_version, latest_url = get_latest_ver(url=url, timeout=timeout)
+    if latest_url:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(cache_file, "w") as f:
+                json.dump(
+                    {
+                        "url": url,
+                        "checked": time.time(),
+                        "version": list(latest_version),
+                        "link": latest_url,
+                    },
+                    f,
+                )
+        except OSError as e:
+            logger.warning(f"Unable to cache update check: {e}")
     return latest_version, latest_url
 
 
 def update_available(
-    current_ver: str = CURRENT_VERSION, latest_ver: Version = get_latest_ver()[0]
+    current_ver: str = CURRENT_VERSION, latest_ver: Optional[Version] = None
 ) -> bool:
+    if latest_ver is None:
+        latest_ver = cached_latest_ver()[0]
     current_ver_tuple = tuple(int(x) for x in current_ver.lstrip("v").split("."))
     return latest_ver > current_ver_tuple
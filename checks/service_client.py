@@ -0,0 +1,193 @@
+import asyncio
+import http.client
+import io
+import json
+import sys
+import tempfile
+import threading
+import zipfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+# Check of the HTTP service, driven by a local client
+#
+# Starts service.BridgeService on a free port of this machine, with a synthetic
+# Student Portal workbook, and sends it requests with http.client: a conversion
+# (sent with a Content-Length, and chunked), every assignment as a zip, an
+# assignment name that can't be a file name as it is, and the requests that must be
+# turned away (bad file names, too large, unknown paths and methods). Then checks
+# that /metrics counted them.
+#
+# Run from the repository root:
+#   python checks/service_client.py
+
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+sys.path.append(str(REPO_ROOT.joinpath("benchmarks")))  # For synthetic
+
+from service import BridgeService  # noqa: E402
+from synthetic import write_student_portal, write_teams_csv  # noqa: E402
+
+MAX_UPLOAD_BYTES: int = 100_000
+Response = Tuple[int, Dict[str, str], bytes]
+
+
+class ServiceThread(threading.Thread):
+    """A BridgeService running on its own event loop, until stop() is called"""
+
+    def __init__(self, student_list: Path) -> None:
+        super(ServiceThread, self).__init__(daemon=True)
+        self.student_list: Path = student_list
+        self.port: int = 0
+        self.ready = threading.Event()
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+        self.__stop: Optional[asyncio.Event] = None
+
+    def run(self) -> None:
+        asyncio.run(self.__serve())
+
+    async def __serve(self) -> None:
+        self.__loop = asyncio.get_running_loop()
+        self.__stop = asyncio.Event()
+        service = BridgeService(self.student_list, max_upload_bytes=MAX_UPLOAD_BYTES)
+        await service.start("127.0.0.1", 0)
+        self.port = service.port
+        self.ready.set()
+        try:
+            await self.__stop.wait()
+        finally:
+            service.close()
+
+    def stop(self) -> None:
+        self.__loop.call_soon_threadsafe(self.__stop.set)
+        self.join()
+
+
+def request(
+    port: int,
+    method: str,
+    path: str,
+    body: Optional[object] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    try:
+        chunked = body is not None and not isinstance(body, bytes)
+        connection.request(
+            method, path, body=body, headers=headers or {}, encode_chunked=chunked
+        )
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def pieces(data: bytes, size: int = 1000) -> Iterator[bytes]:
+    # An upload of unknown length, which http.client sends chunked
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def check(description: str, passed: bool) -> bool:
+    print(f"{'ok  ' if passed else 'FAIL'} {description}")
+    return passed
+
+
+def main() -> int:
+    results: List[bool] = []
+    with tempfile.TemporaryDirectory() as directory:
+        student_list = Path(directory).joinpath("Student Portal.xlsx")
+        write_student_portal(student_list, 200, title="Service check")
+        export = Path(directory).joinpath("grades P02.csv")
+        write_teams_csv(export, 100, assignments=3, unmatched=0.1)
+        data = export.read_bytes()
+
+        service = ServiceThread(student_list)
+        service.start()
+        if not service.ready.wait(60):
+            print("FAIL service did not start")
+            return 1
+        port = service.port
+        convert = "/convert?filename=grades%20P02.csv"
+        try:
+            status, headers, body = request(port, "GET", "/health")
+            results.append(check("/health is ok", status == 200))
+
+            status, headers, body = request(port, "POST", convert, data)
+            results.append(check("converts an upload", status == 200))
+            results.append(check("to a workbook", body[:2] == b"PK"))
+            results.append(
+                check(
+                    "named after the latest assignment",
+                    quote("2 - Assignment 3.xlsx")
+                    in headers.get("Content-Disposition", ""),
+                )
+            )
+            unmatched = int(headers.get("X-Unmatched-Students", "0"))
+            results.append(check("counts unmatched students", unmatched > 0))
+
+            status, _, chunked_body = request(port, "POST", convert, pieces(data))
+            results.append(check("accepts a chunked upload", status == 200))
+            results.append(check("to a workbook too", chunked_body[:2] == b"PK"))
+
+            status, headers, body = request(port, "POST", f"{convert}&all=1", data)
+            names = (
+                zipfile.ZipFile(io.BytesIO(body)).namelist() if status == 200 else []
+            )
+            outputs = [name for name in names if name.endswith(".xlsx")]
+            results.append(check("all=1 gives every assignment", len(outputs) == 3))
+
+            for name in ("..", ".", ""):
+                status, _, body = request(
+                    port, "POST", f"/convert?filename={name}", data
+                )
+                results.append(check(f"filename={name!r} is a 400", status == 400))
+                results.append(
+                    check(
+                        "without server paths", tempfile.gettempdir() not in str(body)
+                    )
+                )
+            header, rest = data.split(b"\n", 1)
+            slashed = (
+                header.replace(b"Assignment 3", b"Unit 1/2 Test", 1) + b"\n" + rest
+            )
+            status, headers, body = request(port, "POST", convert, slashed)
+            results.append(
+                check("a / in an assignment name is converted", status == 200)
+            )
+            results.append(
+                check(
+                    "to a file name without it",
+                    quote("2 - Unit 1_2 Test.xlsx")
+                    in headers.get("Content-Disposition", ""),
+                )
+            )
+            results.append(
+                check("without server paths", tempfile.gettempdir() not in str(body))
+            )
+            status, _, _ = request(port, "POST", "/convert?filename=grades.csv", data)
+            results.append(check("no class period is a 400", status == 400))
+
+            large = b"x" * (MAX_UPLOAD_BYTES + 1)
+            status, _, _ = request(port, "POST", convert, large)
+            results.append(check("too large is a 413", status == 413))
+            status, _, _ = request(port, "GET", "/nowhere")
+            results.append(check("unknown path is a 404", status == 404))
+            status, _, _ = request(port, "GET", convert)
+            results.append(check("GET /convert is a 405", status == 405))
+
+            status, _, body = request(port, "GET", "/metrics")
+            metrics = json.loads(body) if status == 200 else {}
+            statuses = metrics.get("statuses", {})
+            results.append(
+                check("/metrics counts conversions", statuses.get("200", 0) >= 3)
+            )
+            results.append(check("and errors", statuses.get("400", 0) == 4))
+        finally:
+            service.stop()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
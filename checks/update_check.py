@@ -0,0 +1,98 @@
+import http.server
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import List
+
+# Check of the update check against a local stub of GitHub's releases API
+#
+# Serves a fixed "latest release" from http.server on a free port, then checks that
+# check_updates.cached_latest_ver reads it, caches it (a second call makes no
+# request), asks again with force, and reports nothing (and caches nothing) when the
+# server answers with an error. Nothing is sent to GitHub.
+#
+# Run from the repository root:
+#   python checks/update_check.py
+
+REPO_ROOT: Path = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from check_updates import cached_latest_ver, update_available  # noqa: E402
+
+RELEASE = {
+    "tag_name": "v9.8.7",
+    "html_url": "https://example.invalid/releases/v9.8.7",
+}
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    requests: List[str] = []  # Paths asked for, by every handler
+
+    def do_GET(self) -> None:
+        StubHandler.requests.append(self.path)
+        if self.path == "/latest":
+            body, status = json.dumps(RELEASE).encode(), 200
+        else:
+            body, status = b'{"message": "Not Found"}', 404
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass  # Keep the output to the checks themselves
+
+
+def check(description: str, passed: bool) -> bool:
+    print(f"{'ok  ' if passed else 'FAIL'} {description}")
+    return passed
+
+
+def main() -> int:
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    results: List[bool] = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            cache = Path(directory).joinpath("update_check.json")
+            url = f"{base}/latest"
+
+            version, link = cached_latest_ver(url=url, cache_file=cache)
+            results.append(check("reads the latest release", version == (9, 8, 7)))
+            results.append(
+                check("reads the download page", link == RELEASE["html_url"])
+            )
+            results.append(check("caches the result", cache.is_file()))
+
+            asked = len(StubHandler.requests)
+            cached = cached_latest_ver(url=url, cache_file=cache)
+            results.append(check("uses the cached result", cached == (version, link)))
+            results.append(
+                check("without a request", len(StubHandler.requests) == asked)
+            )
+
+            cached_latest_ver(url=url, cache_file=cache, force=True)
+            results.append(
+                check("asks again with force", len(StubHandler.requests) == asked + 1)
+            )
+            results.append(
+                check("finds an update", update_available("1.0.0", latest_ver=version))
+            )
+
+            missing = Path(directory).joinpath("missing.json")
+            failed = cached_latest_ver(url=f"{base}/missing", cache_file=missing)
+            results.append(
+                check("reports nothing on an error", failed == ((0, 0, 0), ""))
+            )
+            results.append(check("and caches nothing", not missing.exists()))
+    finally:
+        server.shutdown()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from constants import (
+    DEFAULT_WRITER,
+    SERVICE_HOST,
+    SERVICE_PORT,
+    STREAM_CHUNK_ROWS,
+    VERSION,
+    WATCH_POLL_SECONDS,
+    WATCH_SETTLE_SECONDS,
+    WRITER_CSV,
+    WRITERS,
+)
+
+# Copyright © 2020, Dylan Armitage. Some rights reserved.
+# This work is licensed under the GNU General Public License, version 3.
+
+# Command line entry point. Must never import PyQt5 (directly or indirectly), so that
+# it starts quickly and works on machines without a display.
+
+logger = logging.getLogger(__name__)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="TeamsAtlasBridge",
+        description="Bridging the disconnect between MS Teams and ATLAS",
+    )
+    parser.add_argument("--version", action="version", version=VERSION)
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Show debug logging"
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Log the time, rows and peak memory of each processing stage as JSON, "
+        "and print a summary at the end",
+    )
+    parser.add_argument(
+        "--profile-out",
+        type=Path,
+        metavar="FILE",
+        help="Run under cProfile and save the stats to FILE (view with pstats or "
+        "snakeviz); only covers this process, so best used with --workers 1",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch = subparsers.add_parser(
+        "batch", help="Process every Teams grade CSV in a folder"
+    )
+    batch.add_argument("directory", type=Path, help="Folder of Teams grade CSVs")
+    batch.add_argument(
+        "--students",
+        type=Path,
+        nargs="+",
+        action="extend",
+        required=True,
+        help="Student Portal logins workbook(s); students from all of them are used",
+    )
+    batch.add_argument(
+        "--out", type=Path, required=True, help="Folder to write the ATLAS files to"
+    )
+    batch.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read each CSV in chunks, keeping memory use flat for very large exports",
+    )
+    batch.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=STREAM_CHUNK_ROWS,
+        help=f"CSV rows per chunk with --stream (default: {STREAM_CHUNK_ROWS})",
+    )
+    batch.add_argument(
+        "--writer",
+        choices=WRITERS,
+        default=DEFAULT_WRITER,
+        help=f"How ATLAS files are written (default: {DEFAULT_WRITER})",
+    )
+    batch.add_argument(
+        "--workbook",
+        metavar="NAME",
+        help="Write every assignment as a sheet of this one workbook in --out",
+    )
+    batch.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes to use (default: 1, 0 for one per CPU)",
+    )
+    batch.add_argument(
+        "--force",
+        action="store_true",
+        help="Process every file, even those whose outputs are already up to date",
+    )
+    add_scale_arguments(batch)
+    batch.set_defaults(func=run_batch)
+
+    watch = subparsers.add_parser(
+        "watch", help="Process new Teams grade CSVs as they appear in a folder"
+    )
+    watch.add_argument("directory", type=Path, help="Folder to watch")
+    watch.add_argument(
+        "--students",
+        type=Path,
+        nargs="+",
+        action="extend",
+        required=True,
+        help="Student Portal logins workbook(s); students from all of them are used",
+    )
+    watch.add_argument(
+        "--out", type=Path, required=True, help="Folder to write the ATLAS files to"
+    )
+    watch.add_argument(
+        "--interval",
+        type=float,
+        default=WATCH_POLL_SECONDS,
+        help=f"Seconds between checks of the folder (default: {WATCH_POLL_SECONDS})",
+    )
+    watch.add_argument(
+        "--settle",
+        type=float,
+        default=WATCH_SETTLE_SECONDS,
+        help=f"Seconds a file must be unchanged before it is processed "
+        f"(default: {WATCH_SETTLE_SECONDS})",
+    )
+    watch.set_defaults(func=run_watch)
+
+    serve = subparsers.add_parser(
+        "serve", help="Run a local HTTP service that converts uploaded Teams CSVs"
+    )
+    serve.add_argument(
+        "--students",
+        type=Path,
+        nargs="+",
+        action="extend",
+        required=True,
+        help="Student Portal logins workbook(s); students from all of them are used",
+    )
+    serve.add_argument(
+        "--host",
+        default=SERVICE_HOST,
+        help=f"Address to listen on (default: {SERVICE_HOST}, this machine only)",
+    )
+    serve.add_argument(
+        "--port", type=int, default=SERVICE_PORT, help=f"(default: {SERVICE_PORT})"
+    )
+    serve.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes to convert in (default: 1, 0 for one per CPU)",
+    )
+    serve.add_argument(
+        "--max-concurrent",
+        type=int,
+        help="Conversions to run at once (default: one per worker)",
+    )
+    serve.add_argument(
+        "--max-pending",
+        type=int,
+        help="Conversions to queue before refusing requests with 503 "
+        "(default: twice --max-concurrent)",
+    )
+    serve.set_defaults(func=run_serve)
+    return parser
+
+
+def add_scale_arguments(parser: argparse.ArgumentParser) -> None:
+    scaling = parser.add_argument_group(
+        "grade scaling", "Applied to every assignment's points before writing"
+    )
+    scale_to = scaling.add_mutually_exclusive_group()
+    scale_to.add_argument(
+        "--percent",
+        action="store_true",
+        help="Write points as a percentage of the assignment's total",
+    )
+    scale_to.add_argument(
+        "--scale-to",
+        type=float,
+        metavar="POINTS",
+        help="Rescale points to be out of POINTS instead of the assignment's total",
+    )
+    scaling.add_argument(
+        "--round",
+        type=int,
+        metavar="DECIMALS",
+        help="Round points (half up) to DECIMALS decimal places",
+    )
+    scaling.add_argument(
+        "--clamp",
+        action="store_true",
+        help="Keep points between 0 and the total (extra credit is capped)",
+    )
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    from batch import process_directory
+    from scaling import GradeScale, validate
+
+    scale = GradeScale(
+        percent=args.percent,
+        points=args.scale_to,
+        decimals=args.round,
+        clamp=args.clamp,
+    )
+    try:
+        validate(scale)
+    except ValueError as e:
+        logger.error(str(e))
+        return 2
+
+    if args.workbook is not None and (args.stream or args.writer == WRITER_CSV):
+        logger.error("--workbook can not be used with --stream or --writer csv")
+        return 2
+    workbook = args.workbook
+    if workbook is not None and not workbook.lower().endswith(".xlsx"):
+        workbook = f"{workbook}.xlsx"
+
+    if not args.directory.is_dir():
+        logger.error(f"Not a directory: {args.directory}")
+        return 2
+    missing = [file for file in args.students if not file.is_file()]
+    if missing:
+        logger.error(f"Student logins file(s) not found: {missing}")
+        return 2
+    result = process_directory(
+        directory=args.directory,
+        student_list=args.students,
+        output_dir=args.out,
+        stream=args.stream,
+        chunk_rows=args.chunk_rows,
+        writer=args.writer,
+        workers=args.workers,
+        force=args.force,
+        scale=scale,
+        workbook=workbook,
+    )
+    for output in result.written:
+        print(output)
+    print_unmatched(result.written)
+    for file in result.failed:
+        print(f"FAILED: {file}", file=sys.stderr)
+    if result.skipped:
+        print(
+            f"{len(result.skipped)} file(s) already up to date (use --force to rebuild)",
+            file=sys.stderr,
+        )
+    return 1 if result.failed else 0
+
+
+def print_unmatched(outputs: List[Path]) -> None:
+    from unmatched import summarize
+
+    for summary in summarize(outputs):
+        print(f"WARNING: {summary}", file=sys.stderr, flush=True)
+
+
+def run_watch(args: argparse.Namespace) -> int:
+    from watch import watch_directory
+
+    if not args.directory.is_dir():
+        logger.error(f"Not a directory: {args.directory}")
+        return 2
+    missing = [file for file in args.students if not file.is_file()]
+    if missing:
+        logger.error(f"Student logins file(s) not found: {missing}")
+        return 2
+
+    def report(written: List[Path], failed: List[Path]) -> None:
+        for output in written:
+            print(output, flush=True)
+        print_unmatched(written)
+        for file in failed:
+            print(f"FAILED: {file}", file=sys.stderr, flush=True)
+
+    print(f"Watching {args.directory}, press Ctrl+C to stop", file=sys.stderr)
+    try:
+        watch_directory(
+            directory=args.directory,
+            student_list=args.students,
+            output_dir=args.out,
+            interval=args.interval,
+            settle=args.settle,
+            report=report,
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run_serve(args: argparse.Namespace) -> int:
+    from service import run_service
+
+    missing = [file for file in args.students if not file.is_file()]
+    if missing:
+        logger.error(f"Student logins file(s) not found: {missing}")
+        return 2
+    print(
+        f"Serving on http://{args.host}:{args.port}/, press Ctrl+C to stop",
+        file=sys.stderr,
+    )
+    try:
+        run_service(
+            student_list=args.students,
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+            max_concurrent=args.max_concurrent,
+            max_pending=args.max_pending,
+        )
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.WARNING,
+        format="%(asctime)s: [%(name)s/%(levelname)s] %(message)s",
+    )
+    if args.profile:
+        import profiling
+
+        profiling.enable(trace_memory=True)
+        logging.getLogger(profiling.__name__).setLevel(logging.DEBUG)
+    profiler = None
+    if args.profile_out is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    try:
+        if profiler is not None:
+            return profiler.runcall(args.func, args)
+        return args.func(args)
+    finally:
+        if profiler is not None:
+            profiler.dump_stats(args.profile_out)
+            print(f"Profile saved to {args.profile_out}", file=sys.stderr)
+        if args.profile:
+            print(profiling.summary(profiling.collect()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,54 @@ INPUT_TEAMS_FILE: int = 1
 INPUT_STUDENT_FILE: int = 2
 OUTPUT_XLSX: int = 3
 VALID_EXTENSIONS: List[str] = ["xlsx", "xls", "csv"]
+APP_DIR_NAME: str = "TeamsAtlasBridge"
+
+# Output backends for ATLAS files (see writers.py)
+#   * "pandas":    DataFrame.to_excel, which builds the whole workbook in memory first
+#   * "streaming": openpyxl's write-only mode, rows go straight to a temporary file on
+#                  disk and are zipped up on save. Much less memory, and faster.
+#   * "csv":       plain CSV files, which ATLAS also accepts. No workbook to build at all.
+WRITER_PANDAS: str = "pandas"
+WRITER_STREAMING: str = "streaming"
+WRITER_CSV: str = "csv"
+WRITERS: List[str] = [WRITER_PANDAS, WRITER_STREAMING, WRITER_CSV]
+DEFAULT_WRITER: str = WRITER_STREAMING
+OUTPUT_SUFFIXES: Dict[str, str] = {
+    WRITER_PANDAS: ".xlsx",
+    WRITER_STREAMING: ".xlsx",
+    WRITER_CSV: ".csv",
+}
+SHEET_TITLE_MAX_LENGTH: int = 31  # Excel's limit, for outputs written as sheets
+
+STREAM_CHUNK_ROWS: int = 50_000  # Teams CSV rows per chunk when streaming
+
+# Students that could not be matched are listed next to the ATLAS file (see unmatched.py)
+UNMATCHED_REPORT_SUFFIX: str = " - unmatched.csv"
+SUGGESTION_LIMIT: int = 3  # Close usernames suggested for each unmatched student
+SUGGESTION_MIN_SCORE: float = 0.3  # Share of trigrams in common, 0 to 1
+SUGGESTION_DENSE_RATIO: int = 8  # See roster.StudentRoster.suggest
+
+# Kept in the output folder by the batch runner, see manifest.py
+MANIFEST_NAME: str = ".tab_manifest.json"
+
+# Watch mode (see watch.py)
+WATCH_POLL_SECONDS: float = 2.0
+WATCH_SETTLE_SECONDS: float = 3.0  # A file must be unchanged this long to be processed
+WATCH_LEDGER_NAME: str = ".tab_processed.json"  # Kept in the output folder
+
+# HTTP service mode (see service.py)
+SERVICE_HOST: str = "127.0.0.1"
+SERVICE_PORT: int = 8765
+SERVICE_MAX_UPLOAD_BYTES: int = 256 * 1024 * 1024
+SERVICE_LATENCY_WINDOW: int = 1000  # Recent conversions the latency percentiles cover
+
+UPDATE_CHECK_TIMEOUT: float = 5.0  # Seconds
+UPDATE_CHECK_INTERVAL: int = 24 * 60 * 60  # Seconds between checks at startup
+
+# Parsed rosters are cached on disk (see roster_cache.py)
+# Bump ROSTER_CACHE_FORMAT whenever what is stored in the cache changes
+ROSTER_CACHE_FORMAT: int = 1
+ROSTER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
 
 # Frame names
 INPUT_TEAMS_FRAME: str = "frame_grade_csv"
@@ -50,5 +98,9 @@ STUDENT_LOGINS: Dict[str, Union[int, List[str]]] = {
 #       columns 3,4,5 repeat for each assignment, with the most recent assignment being the "first" one.
 #       * Example row (header):
 #           "First Name","Last Name","Email Address","Unit 2 Quiz","Points","Feedback","Unit 1 Quiz","Points","Feedback"
-#       * TODO: May need to create some sort of structure/class/etc. to load multiple assignments properly.
-TEAMS_CSV: Dict[str, Union[int, List[int]]] = {"usecols": [2, 3]}
+#       * Every assignment is loaded in one pass, see process.read_grades
+TEAMS_CSV: Dict[str, int] = {
+    "email_col": 2,
+    "first_assignment_col": 3,
+    "assignment_width": 3,  # Points, total, feedback
+}
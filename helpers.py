@@ -1,7 +1,10 @@
+import hashlib
+import os
+import sys
 from functools import wraps
 from pathlib import Path
 
-from constants import VALID_EXTENSIONS
+from constants import APP_DIR_NAME, VALID_EXTENSIONS
 
 
 def add_method(cls):
@@ -24,4 +27,34 @@ def add_method(cls):
 
 
 def valid_extension(file: Path) -> bool:
-    return bool([ext for ext in VALID_EXTENSIONS if (ext in file.name)])
+    return file.suffix.lower().lstrip(".") in VALID_EXTENSIONS
+
+
+def user_data_dir() -> Path:
+    """
+    Per-user folder for caches and other data that should survive between runs
+
+    :return: Path
+    """
+    if sys.platform.startswith("win"):
+        base = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local"))
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Application Support"
+    else:
+        base = Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share"))
+    return base / APP_DIR_NAME
+
+
+def file_hash(file: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file's contents, read in chunks
+
+    :param file: Path
+    :param chunk_size: int
+    :return: str, hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
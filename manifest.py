@@ -0,0 +1,84 @@
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List
+
+import constants
+
+# Manifest of what a batch run wrote into an output folder.
+# For every Teams CSV it records the hashes of the CSV and the roster it was matched
+# against, the app version, the options used and the files written. On a re-run, a
+# CSV whose entry still matches (and whose outputs all still exist) is skipped.
+
+logger = logging.getLogger(__name__)
+
+
+class OutputManifest:
+    def __init__(self, output_dir: Path) -> None:
+        self.file: Path = output_dir.joinpath(constants.MANIFEST_NAME)
+        self.__entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(self.file, "r") as f:
+                self.__entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.file}: {e}")
+
+    @staticmethod
+    def __entry(
+        source_hash: str,
+        roster_hash: str,
+        options: Dict[str, Any],
+        outputs: List[Path],
+    ) -> Dict[str, Any]:
+        return {
+            "source_hash": source_hash,
+            "roster_hash": roster_hash,
+            "version": constants.VERSION,
+            "options": options,
+            "outputs": [str(output) for output in outputs],
+        }
+
+    def is_current(
+        self,
+        source: Path,
+        source_hash: str,
+        roster_hash: str,
+        options: Dict[str, Any],
+        outputs: List[Path],
+    ) -> bool:
+        """
+        Whether source was already processed into outputs with the same inputs
+
+        :param source: Path, Teams CSV
+        :param source_hash: str, from helpers.file_hash
+        :param roster_hash: str, StudentRoster.content_hash
+        :param options: Dict[str, Any], processing options that affect the outputs
+        :param outputs: List[Path], the files that would be written
+        :return: bool
+        """
+        entry = self.__entries.get(str(source.resolve()))
+        expected = self.__entry(source_hash, roster_hash, options, outputs)
+        return entry == expected and all(output.is_file() for output in outputs)
+
+    def record(
+        self,
+        source: Path,
+        source_hash: str,
+        roster_hash: str,
+        options: Dict[str, Any],
+        outputs: List[Path],
+    ) -> None:
+        self.__entries[str(source.resolve())] = self.__entry(
+            source_hash, roster_hash, options, outputs
+        )
+
+    def save(self) -> None:
+        tmp = self.file.with_suffix(".tmp")
+        try:
+            with open(tmp, "w") as f:
+                json.dump(self.__entries, f, indent=1)
+            tmp.replace(self.file)
+        except OSError as e:
+            logger.warning(f"Unable to save manifest {self.file}: {e}")
@@ -0,0 +1,181 @@
+import csv
+import logging
+import re
+from pathlib import Path
+from typing import List, Optional, Sequence, Set
+
+import constants
+
+# What a Teams export holds, worked out from its name and header row alone: the class
+# period and each assignment, with the name of the ATLAS file it becomes. Cheap enough
+# to build as soon as a file is dropped, and only uses the standard library, so that
+# pandas is not loaded until there is something to process.
+
+logger = logging.getLogger(__name__)
+
+# Characters that can't be in a file name on Windows (or, for "/", anywhere)
+INVALID_FILE_CHARACTERS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+class Assignment:
+    """One assignment (three columns) of a Teams export"""
+
+    __slots__ = ("name", "period", "index")
+
+    def __init__(self, name: str, period: int, index: int = 0) -> None:
+        self.name: str = name
+        self.period: int = period
+        self.index: int = index  # Position in the export, 0 being the most recent
+
+    @property
+    def file_name(self) -> str:
+        """Name of the ATLAS file for this assignment, without the extension"""
+        return assignment_file_name(assignment=self.name, period=self.period)
+
+    def __repr__(self) -> str:
+        return f"Assignment({self.name!r}, period={self.period}, index={self.index})"
+
+
+class TeamsExport:
+    """A Teams grades CSV and the assignments in it, most recent first"""
+
+    __slots__ = ("file", "period", "assignments")
+
+    def __init__(self, file: Path, period: int, names: Sequence[str]) -> None:
+        self.file: Path = file
+        self.period: int = period
+        self.assignments: List[Assignment] = [
+            Assignment(name, period, index) for index, name in enumerate(names)
+        ]
+
+    @classmethod
+    def from_file(cls, file: Path) -> "TeamsExport":
+        """
+        Read the class period from a file's name and the assignments from its header
+
+        :param file: Path
+        :return: TeamsExport
+        """
+        return cls(file, class_period(file), assignment_names(file))
+
+    @property
+    def latest(self) -> Assignment:
+        return self.assignments[0]
+
+    @property
+    def names(self) -> List[str]:
+        return [assignment.name for assignment in self.assignments]
+
+    def file_names(self, taken: Optional[Set[str]] = None) -> List[str]:
+        """Unique ATLAS file names for every assignment, see output_file_names"""
+        return output_file_names(self.names, self.period, taken=taken)
+
+    def __len__(self) -> int:
+        return len(self.assignments)
+
+    def __repr__(self) -> str:
+        return f"TeamsExport({self.file.name!r}, {len(self)} assignment(s))"
+
+
+def assignment_names(file: Path) -> List[str]:
+    """
+    Get the names of every assignment in a Teams Assignment CSV, most recent first
+
+    :param file: Path
+    :return: List[str]
+    """
+    logger.debug("Processing assignment names...")
+    # Decoded as process.read_header does, so file names match the column headers
+    with open(file, "r", newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), [])
+    return header_assignment_names(header, file)
+
+
+def header_assignment_names(header: List[str], file: Path) -> List[str]:
+    """
+    The assignment names in a Teams Assignment CSV's header row, most recent first
+
+    :param header: List[str], the header row, already split into columns
+    :param file: Path, only used in the error if there are no assignments
+    :return: List[str]
+    """
+    first = constants.TEAMS_CSV["first_assignment_col"]
+    names = header[first :: constants.TEAMS_CSV["assignment_width"]]
+    if not names:
+        raise ValueError(f"No assignments found in {file.name}")
+    logger.info(f"Assignment names: {names}")
+    return names
+
+
+def class_period(file: Path) -> int:
+    """
+    Get the period of an assignment file
+
+    :param file: Path
+    :return: int
+    """
+    logger.debug("Extracting class period...")
+    loc = file.name.find("P0")
+    if loc == -1 or not file.name[loc + 2 : loc + 3].isdigit():
+        raise ValueError(f"No class period (P0x) found in file name: {file.name}")
+    period = int(file.name[loc + 2])
+    logger.info(f"Class period: {period}")
+    return period
+
+
+def assignment_file_name(assignment: str, period: int) -> str:
+    """
+    Generate the name of the assignment file to upload to ATLAS
+
+    Characters that can't be in a file name are replaced with "_", see safe_file_name.
+
+    :param assignment: str
+    :param period: int
+    :return: str
+    """
+    logger.debug("Creating assignment file name for export...")
+    name = safe_file_name(f"{period} - {assignment}")
+    logger.info(f"Output file name: {name}")
+    return name
+
+
+def safe_file_name(name: str) -> str:
+    """
+    A name that can be used as a file name on any system, and stays in its folder
+
+    Path separators, the other characters Windows does not allow, and control
+    characters become "_". Trailing dots and spaces, which Windows drops, are removed.
+
+    :param name: str
+    :return: str
+    """
+    return INVALID_FILE_CHARACTERS.sub("_", name).rstrip(". ") or "_"
+
+
+def output_file_names(
+    names: List[str], period: int, taken: Optional[Set[str]] = None
+) -> List[str]:
+    """
+    Output file names (without extension) for every assignment in a file
+
+    Names are made unique with a " (2)", " (3)", ... suffix. To keep names unique
+    across several files, pass the same taken set for each; it is updated in place.
+
+    :param names: List[str], assignment names
+    :param period: int
+    :param taken: Optional[Set[str]], file names already in use
+    :return: List[str]
+    """
+    if taken is None:
+        taken = set()
+    file_names: List[str] = []
+    for name in names:
+        file_name = assignment_file_name(assignment=name, period=period)
+        count = 2
+        unique_name = file_name
+        while unique_name in taken:
+            unique_name = f"{file_name} ({count})"
+            count += 1
+        taken.add(unique_name)
+        file_names.append(unique_name)
+    return file_names
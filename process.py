@@ -1,86 +1,488 @@
+import csv
+import io
 import logging
+import mmap
+import os
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
 
 import constants
+from constants import DEFAULT_WRITER
+from model import (
+    assignment_names,
+    class_period,
+    header_assignment_names,
+    output_file_names,
+)
+from profiling import stage
+from roster import StudentRoster, load_roster
+from scaling import NO_SCALE, GradeScale, scale_grades
+from unmatched import issues, report_rows, write_report
+from writers import SheetsWorkbook, output_suffix, streaming_output, write_output
 
 logger = logging.getLogger(__name__)
 
+# Called with a description of the current stage and the overall percent complete.
+# Raising Cancelled from it stops processing before the next stage starts.
+ProgressCallback = Callable[[str, int], None]
+
+
+class Cancelled(Exception):
+    """Processing was cancelled from a progress callback"""
+
+
+def no_progress(stage: str, percent: int) -> None:
+    pass
+
 
 def assignment_name(file: Path) -> str:
     """
     Get the name of an assignment from a Teams Assignment CSV
 
+    If the file holds several assignments, this is the first (most recent) one.
+
     :param file: Path
     :return: str
     """
-    # TODO: get multiple assignments, if present
     logger.debug("Processing assignment name...")
-    with open(file, "r") as f:
-        line = f.readline()
-    name = line.split(",")[3].strip('"')
+    name = assignment_names(file)[0]
     logger.info(f"Assignment name: {name}")
     return name
 
 
-def class_period(file: Path) -> int:
+def read_grades(file: Path) -> Tuple[List[str], pd.DataFrame]:
     """
-    Get the period of an assignment file
-    
+    Read a Teams Assignment CSV into a long table, one row per student per assignment
+
+    The file is parsed once, whether it holds a single assignment or a full-section
+    export, with the header and body both read from the one memory mapping. The table
+    has the columns "Email Address" (already split down to the username, as a
+    categorical), "Assignment" (index into the returned names), "Points" and "Total".
+    Points and totals that are not numbers are read as NaN. An export with only its
+    header row gives an empty table.
+
     :param file: Path
-    :return: int
+    :return: Tuple[List[str], pd.DataFrame], the assignment names and the table
     """
-    logger.debug("Extracting class period...")
-    loc = file.name.find("P0")
-    period = int(file.name[loc + 2])
-    logger.info(f"Class period: {period}")
-    return period
+    with stage("csv.read") as timing, mapped_csv(file) as buffer:
+        names = read_header(buffer, file)
+        try:
+            raw = pd.read_csv(buffer, header=None)
+        except pd.errors.EmptyDataError:  # No students yet, only the header
+            raw = pd.DataFrame()
+        timing.rows = len(raw)
+    logger.debug("Teams grade CSV file loaded")
+    grades = _long_grades(raw, len(names))
+    logger.debug(f"{len(names)} assignment(s) split into {len(grades)} rows")
+    return names, grades
 
 
-def assignment_file_name(assignment: str, period: int) -> str:
+@contextmanager
+def mapped_csv(file: Path) -> Iterator[mmap.mmap]:
     """
-    Generate the name of the assignment file to upload to ATLAS
-    
-    :param assignment: str
-    :param period: int
-    :return: str
+    Map a CSV into memory, read-only, so that it is opened and read only once
+
+    The mapping can be handed straight to pd.read_csv, which parses from wherever
+    it is positioned, so the header can be read off it first with read_header.
+
+    :param file: Path
+    :return: Iterator[mmap.mmap], as a context manager
     """
-    logger.debug("Creating assignment file name for export...")
-    name = f"{period} - {assignment}"
-    logger.info(f"Output file name: {name}")
-    return name
+    with open(file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:  # Empty files can't be mapped
+            raise ValueError(f"No assignments found in {file.name}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def read_header(buffer: mmap.mmap, file: Path) -> List[str]:
+    """
+    Read the assignment names from the header row of a mapped Teams CSV
+
+    Leaves the mapping positioned at the start of the first row of grades.
+
+    :param buffer: mmap.mmap, from mapped_csv
+    :param file: Path, for errors
+    :return: List[str]
+    """
+    line = buffer.readline()
+    while line.count(b'"') % 2 and buffer.tell() < buffer.size():
+        line += buffer.readline()  # A quoted name with a line break in it
+    header = next(csv.reader(io.StringIO(line.decode("utf-8-sig"))), [])
+    return header_assignment_names(header, file)
+
+
+def _long_grades(raw: pd.DataFrame, count: int) -> pd.DataFrame:
+    # Turn the CSV's repeated (points, total, feedback) columns into one row per
+    # student per assignment. raw is the CSV body, without its header row.
+    with stage("csv.reshape", rows=len(raw) * count):
+        return _reshape_grades(raw, count)
+
+
+def _reshape_grades(raw: pd.DataFrame, count: int) -> pd.DataFrame:
+    email_col = constants.TEAMS_CSV["email_col"]
+    first = constants.TEAMS_CSV["first_assignment_col"]
+    width = constants.TEAMS_CSV["assignment_width"]
+    # Pad out a truncated final assignment so that every one has a total column
+    raw = raw.reindex(columns=range(max(raw.shape[1], first + width * count)))
+    emails = raw[email_col].astype(str)
+    if len(emails):  # partition gives no columns at all for an empty export
+        emails = emails.str.partition("@")[0]
+    emails = emails.to_numpy()
+    # Each username is stored once, with a small integer code for every row it is on
+    codes, usernames = pd.factorize(emails)
+    codes = codes.astype(np.int32)
+    points = _numeric(raw.iloc[:, first : first + width * count : width])
+    totals = _numeric(raw.iloc[:, first + 1 : first + width * count : width])
+    return pd.DataFrame(
+        {
+            "Email Address": pd.Categorical.from_codes(
+                np.tile(codes, count), categories=usernames
+            ),
+            "Assignment": np.repeat(np.arange(count), len(raw)),
+            # Column-major, so that each assignment's rows stay together
+            "Points": points.ravel(order="F"),
+            "Total": totals.ravel(order="F"),
+        }
+    )
+
+
+def _numeric(columns: pd.DataFrame) -> np.ndarray:
+    # Columns the CSV parser already read as numbers are left alone, only text is coerced
+    return columns.apply(_to_number).to_numpy(dtype=float)
+
+
+def _to_number(column: pd.Series) -> pd.Series:
+    if column.dtype.kind not in "biuf":
+        # Teams wraps some values as ="...", which the CSV parser leaves as text
+        column = column.astype(str).str.strip('="')
+    return pd.to_numeric(column, errors="coerce")
+
+
+def match_grades(grades: pd.DataFrame, roster: StudentRoster) -> pd.DataFrame:
+    """
+    Add the student ID for every row of a grades table
+
+    :param grades: pd.DataFrame, from read_grades
+    :param roster: StudentRoster
+    :return: pd.DataFrame, grades with a StuID column (NaN if not in the roster) and
+             an Issue column for rows that did not match cleanly (see unmatched.py)
+    """
+    logger.info("Input files loaded, matching email addresses...")
+    with stage("match", rows=len(grades)):
+        positions = _locate(grades["Email Address"], roster)
+        matched = grades.assign(
+            StuID=roster.stuids_at(positions), Issue=issues(positions, roster)
+        )
+    logger.info("Email addresses matched")
+    return matched
+
+
+def _locate(usernames: pd.Series, roster: StudentRoster) -> np.ndarray:
+    if isinstance(usernames.dtype, pd.CategoricalDtype):
+        # Each distinct username is looked up once, not once per assignment
+        codes = usernames.cat.codes.to_numpy()
+        return roster.locate(usernames.cat.categories.to_numpy()).take(codes)
+    return roster.locate(usernames.to_numpy())
+
+
+def count_matches(grades: pd.DataFrame, roster: StudentRoster) -> Tuple[int, int]:
+    """
+    How many of the students in a grades table are in the roster, for a preview
+
+    :param grades: pd.DataFrame, from read_grades
+    :param roster: StudentRoster
+    :return: Tuple[int, int], students found and students in the table
+    """
+    usernames = grades["Email Address"]
+    if isinstance(usernames.dtype, pd.CategoricalDtype):
+        unique = usernames.cat.categories.to_numpy()
+    else:
+        unique = usernames.unique()
+    return int(np.count_nonzero(roster.locate(unique) != -1)), len(unique)
+
+
+def assignment_output(matched: pd.DataFrame, index: int, name: str) -> pd.DataFrame:
+    """
+    Select one assignment out of a matched grades table, laid out for ATLAS
+
+    :param matched: pd.DataFrame, from match_grades
+    :param index: int, position of the assignment in the file
+    :param name: str, assignment name
+    :return: pd.DataFrame
+    """
+    output = matched.loc[matched["Assignment"].to_numpy() == index, ["Points", "StuID"]]
+    return output.rename(columns={"Points": name})
 
 
-# noinspection PyArgumentList
 def generate_output(assignment_file: Path, student_list: Path, output: Path) -> None:
     """
     Match email addresses between the files and write out the result
 
+    Only the first (most recent) assignment in the file is written, see
+    generate_outputs for writing all of them.
+
     :param assignment_file: Path
     :param student_list: Path
     :param output: Path
     :return: None
     """
-    logger.info("Generating matched file...")
-    # TODO: If there are multiple files to export, how do we avoid loading the student list for each one?
-    students = pd.read_excel(student_list, **constants.STUDENT_LOGINS)
-    logger.debug("Student login file loaded")
-    students["Username"] = students["Username"].map(lambda x: x.split("@")[0])
-    logger.debug("Student usernames split")
-    teams = pd.read_csv(assignment_file, **constants.TEAMS_CSV)
-    logger.debug("Teams grade CSV file loaded")
-    teams["Email Address"] = teams["Email Address"].map(lambda x: x.split("@")[0])
-    logger.debug("Student email addresses split")
-    logger.info("Input files loaded, matching email addresses...")
-    matched_file = teams.merge(
-        students,
-        how="left",
-        left_on=teams.columns[0],
-        right_on=constants.STUDENT_LOGINS["usecols"][1],
+    generate_output_from_roster(
+        assignment_file=assignment_file, roster=load_roster(student_list), output=output
     )
-    matched_file.drop(columns=["Email Address", "Username"], inplace=True)
-    logger.debug("Removed all other columns")
-    logger.info("Email addresses matched. Writing file(s) out")
-    matched_file.to_excel(output, index=False)
+
+
+# noinspection PyArgumentList
+def generate_output_from_roster(
+    assignment_file: Path,
+    roster: StudentRoster,
+    output: Path,
+    progress: ProgressCallback = no_progress,
+    writer: str = DEFAULT_WRITER,
+    scale: GradeScale = NO_SCALE,
+    grades: Optional[Tuple[List[str], pd.DataFrame]] = None,
+) -> None:
+    """
+    Match email addresses against an already loaded roster and write out the result
+
+    Only the first (most recent) assignment in the file is written.
+
+    :param assignment_file: Path
+    :param roster: StudentRoster
+    :param output: Path
+    :param progress: ProgressCallback
+    :param writer: str, output backend, one of writers.WRITERS
+    :param scale: GradeScale, applied to the points before they are written
+    :param grades: Optional, read_grades(assignment_file) if it has already been read
+    :return: None
+    """
+    logger.info("Generating matched file...")
+    progress("Loading Teams grades", 25)
+    names, grades = read_grades(assignment_file) if grades is None else grades
+    grades = grades[grades["Assignment"].to_numpy() == 0]
+    progress("Matching students", 50)
+    matched = scale_grades(match_grades(grades, roster), scale)
+    progress(f"Writing {output.name}", 75)
+    logger.info("Writing file(s) out")
+    write_output(assignment_output(matched, 0, names[0]), output, writer=writer)
+    write_report(report_rows(matched, 0, names[0]), roster, output)
+    logger.info("File(s) finished writing")
+    progress("Done", 100)
+
+
+def generate_outputs(
+    assignment_file: Path,
+    roster: StudentRoster,
+    output_dir: Path,
+    period: Optional[int] = None,
+    progress: ProgressCallback = no_progress,
+    writer: str = DEFAULT_WRITER,
+    file_names: Optional[List[str]] = None,
+    scale: GradeScale = NO_SCALE,
+    grades: Optional[Tuple[List[str], pd.DataFrame]] = None,
+) -> List[Path]:
+    """
+    Write an ATLAS file for every assignment in a Teams Assignment CSV
+
+    The CSV is read and matched against the roster once, no matter how many
+    assignments it holds. Files are named with model.assignment_file_name; if two
+    assignments share a name, later ones get a " (2)", " (3)", ... suffix.
+
+    :param assignment_file: Path
+    :param roster: StudentRoster
+    :param output_dir: Path
+    :param period: Optional[int], taken from the file name if not given
+    :param progress: ProgressCallback
+    :param writer: str, output backend, one of writers.WRITERS
+    :param file_names: Optional[List[str]], names to write to instead of the default
+    :param scale: GradeScale, applied to the points before they are written
+    :param grades: Optional, read_grades(assignment_file) if it has already been read
+    :return: List[Path], the files written, in the same order as the assignments
+    """
+    logger.info("Generating matched files...")
+    if period is None:
+        period = class_period(assignment_file)
+    progress("Loading Teams grades", 25)
+    names, grades = read_grades(assignment_file) if grades is None else grades
+    if file_names is None:
+        file_names = output_file_names(names, period)
+    progress("Matching students", 50)
+    matched = scale_grades(match_grades(grades, roster), scale)
+    logger.info(f"Writing {len(names)} file(s) out")
+    written: List[Path] = []
+    for index, (name, file_name) in enumerate(zip(names, file_names)):
+        output = output_dir.joinpath(f"{file_name}{output_suffix(writer)}")
+        progress(f"Writing {output.name}", 75 + 25 * index // len(names))
+        write_output(assignment_output(matched, index, name), output, writer=writer)
+        write_report(report_rows(matched, index, name), roster, output)
+        written.append(output)
+    logger.info("File(s) finished writing")
+    progress("Done", 100)
+    return written
+
+
+def stream_outputs(
+    assignment_file: Path,
+    roster: StudentRoster,
+    output_dir: Path,
+    period: Optional[int] = None,
+    chunk_rows: int = constants.STREAM_CHUNK_ROWS,
+    progress: ProgressCallback = no_progress,
+    file_names: Optional[List[str]] = None,
+    scale: GradeScale = NO_SCALE,
+    writer: str = DEFAULT_WRITER,
+) -> List[Path]:
+    """
+    Write an ATLAS file for every assignment, reading the CSV a chunk at a time
+
+    Gives the same files as generate_outputs, but only chunk_rows rows of the CSV are
+    in memory at once: each chunk is matched against the roster and appended straight
+    to streaming workbooks (or CSV files, for the csv writer), so memory use stays
+    flat however large the export is.
+
+    :param assignment_file: Path
+    :param roster: StudentRoster
+    :param output_dir: Path
+    :param period: Optional[int], taken from the file name if not given
+    :param chunk_rows: int, CSV rows read per chunk
+    :param progress: ProgressCallback
+    :param file_names: Optional[List[str]], names to write to instead of the default
+    :param scale: GradeScale, applied to the points before they are written
+    :param writer: str, "csv" for CSV files, otherwise streaming workbooks are written
+    :return: List[Path], the files written, in the same order as the assignments
+    """
+    logger.info("Streaming matched files...")
+    if period is None:
+        period = class_period(assignment_file)
+    progress("Loading Teams grades", 25)
+    rows = 0
+    workbooks: List[Any] = []  # StreamingWorkbook or StreamingCsv, one per assignment
+    try:
+        # The header and every chunk are read from the one mapping of the file
+        with mapped_csv(assignment_file) as buffer:
+            names = read_header(buffer, assignment_file)
+            if file_names is None:
+                file_names = output_file_names(names, period)
+            suffix = output_suffix(writer)
+            outputs = [output_dir.joinpath(f"{name}{suffix}") for name in file_names]
+            for name, output in zip(names, outputs):
+                workbooks.append(
+                    streaming_output(output, header=[name, "StuID"], writer=writer)
+                )
+            reports: List[List[pd.DataFrame]] = [[] for _ in names]  # Rows with issues
+            try:
+                reader = pd.read_csv(buffer, header=None, chunksize=chunk_rows)
+            except pd.errors.EmptyDataError:  # Only the header, as in read_grades
+                reader = None
+            try:
+                for chunk in _timed_chunks(reader or []):
+                    matched = match_grades(_long_grades(chunk, len(names)), roster)
+                    matched = scale_grades(matched, scale)
+                    with stage("write.append", rows=len(matched)):
+                        for index, name in enumerate(names):
+                            workbooks[index].append_frame(
+                                assignment_output(matched, index, name)
+                            )
+                            reports[index].append(report_rows(matched, index, name))
+                    rows += len(chunk)
+                    logger.debug(f"{rows} rows streamed")
+                    progress(f"Matched {rows} students", 50)
+            finally:
+                if reader is not None:
+                    reader.close()
+        logger.info(f"Writing {len(names)} file(s) out")
+        for index, workbook in enumerate(workbooks):
+            progress(f"Writing {workbook.output.name}", 75 + 25 * index // len(names))
+            with stage("write.save", rows=workbook.rows):
+                workbook.save()
+            report = pd.concat(reports[index]) if reports[index] else pd.DataFrame()
+            write_report(report, roster, workbook.output)
+    except BaseException:
+        # Even if cancelled or interrupted, no half-written output is left behind
+        for workbook in workbooks:
+            workbook.discard()
+        raise
     logger.info("File(s) finished writing")
+    progress("Done", 100)
+    return outputs
+
+
+def generate_workbook(
+    assignment_files: List[Path],
+    roster: StudentRoster,
+    output: Path,
+    progress: ProgressCallback = no_progress,
+    scale: GradeScale = NO_SCALE,
+) -> List[Path]:
+    """
+    Write every assignment of several Teams Assignment CSVs as sheets of one workbook
+
+    Sheets are named like the files generate_outputs would write (see
+    model.assignment_file_name), cut down to what Excel allows by
+    writers.sheet_title. The workbook is built and saved once, however many sheets it
+    has. One unmatched report is written next to it, with a Sheet column saying which
+    sheet each row belongs to.
+
+    A file that can't be read or matched is logged and left out, and the workbook is
+    written from the rest; if none of them can be, nothing is written and ValueError
+    is raised.
+
+    :param assignment_files: List[Path]
+    :param roster: StudentRoster
+    :param output: Path, the workbook
+    :param progress: ProgressCallback
+    :param scale: GradeScale, applied to the points before they are written
+    :return: List[Path], the files that were left out
+    """
+    logger.info(f"Generating {output.name} from {len(assignment_files)} file(s)...")
+    workbook = SheetsWorkbook(output)
+    reports: List[pd.DataFrame] = []
+    taken: Set[str] = set()
+    failed: List[Path] = []
+    for position, assignment_file in enumerate(assignment_files):
+        progress(
+            f"Reading {assignment_file.name}", 75 * position // len(assignment_files)
+        )
+        try:
+            period = class_period(assignment_file)
+            names, grades = read_grades(assignment_file)
+            matched = scale_grades(match_grades(grades, roster), scale)
+        except Exception as e:
+            logger.error(f"Failed to process {assignment_file.name}: {e}")
+            failed.append(assignment_file)
+            continue
+        file_names = output_file_names(names, period, taken=taken)
+        for index, (name, file_name) in enumerate(zip(names, file_names)):
+            title = workbook.add_frame(
+                file_name, assignment_output(matched, index, name)
+            )
+            rows = report_rows(matched, index, name).rename(columns={name: "Points"})
+            reports.append(rows.assign(Sheet=title))
+    if len(failed) == len(assignment_files):
+        raise ValueError(f"None of the files for {output.name} could be processed")
+    progress(f"Writing {output.name}", 75)
+    with stage("write.save", rows=workbook.rows):
+        workbook.save()
+    report = pd.concat(reports) if reports else pd.DataFrame()
+    if not report.empty:  # Sheet first, the rest as in every other report
+        report = report[["Sheet"] + [c for c in report.columns if c != "Sheet"]]
+    write_report(report, roster, output)
+    logger.info(f"{len(workbook.titles)} sheet(s) written to {output.name}")
+    progress("Done", 100)
+    return failed
+
+
+def _timed_chunks(reader: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    # Time reading each chunk separately from the work done on it
+    chunks = iter(reader)
+    while True:
+        with stage("csv.read") as timing:
+            chunk = next(chunks, None)
+            timing.rows = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+        yield chunk
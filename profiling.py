@@ -0,0 +1,170 @@
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Lightweight timing of the processing stages (loading the roster, reading the CSV,
+# matching, writing). Every stage is logged as one line of JSON at DEBUG level; once
+# enable() has been called the timings are also kept, for summary() at the end of a
+# run, and with trace_memory the peak memory allocated during each stage is measured.
+
+logger = logging.getLogger(__name__)
+
+
+class StageTiming:
+    """
+    How long one stage took, how many rows it handled and its peak memory
+
+    Set rows inside the stage if the count is not known when it starts.
+    """
+
+    def __init__(self, name: str, rows: Optional[int] = None) -> None:
+        self.name: str = name
+        self.rows: Optional[int] = rows
+        self.seconds: float = 0.0
+        self.peak_bytes: Optional[int] = None
+        self.base_bytes: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.name,
+            "seconds": round(self.seconds, 6),
+            "rows": self.rows,
+            "peak_bytes": self.peak_bytes,
+        }
+
+
+_lock = threading.Lock()
+_records: List[StageTiming] = []
+_enabled: bool = False
+_local = threading.local()  # Stack of the stages open on each thread
+
+
+def enable(trace_memory: bool = False) -> None:
+    """
+    Keep every stage timing for summary(), optionally measuring peak memory too
+
+    Tracing memory slows processing down noticeably, so only use it when profiling.
+
+    :param trace_memory: bool, measure peak memory per stage with tracemalloc
+    :return: None
+    """
+    global _enabled
+    _enabled = True
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def collect() -> List[StageTiming]:
+    """
+    Take every stage timing kept so far
+
+    :return: List[StageTiming], in the order the stages finished
+    """
+    with _lock:
+        records = list(_records)
+        _records.clear()
+    return records
+
+
+def extend(records: List[StageTiming]) -> None:
+    """
+    Add timings collected elsewhere, such as in a worker process
+
+    :param records: List[StageTiming]
+    :return: None
+    """
+    if _enabled:
+        with _lock:
+            _records.extend(records)
+
+
+@contextmanager
+def stage(name: str, rows: Optional[int] = None) -> Iterator[StageTiming]:
+    """
+    Time the code in a with block (or a decorated function) as one stage
+
+    Stages can be nested; the peak memory of an outer stage includes its inner ones.
+
+    :param name: str, short dotted name, e.g. "csv.read"
+    :param rows: Optional[int], rows handled, if known up front
+    :return: Iterator[StageTiming]
+    """
+    timing = StageTiming(name, rows)
+    tracing = tracemalloc.is_tracing()
+    open_stages: List[StageTiming] = _local.__dict__.setdefault("stages", [])
+    if tracing:
+        # tracemalloc has a single peak, so hand it to the stages already open
+        # before resetting it for this one
+        _update_peaks(open_stages)
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        # Before Python 3.9 the peak can't be reset, so a stage's peak may include
+        # memory from before it started: an overestimate, but never an underestimate
+        timing.base_bytes = tracemalloc.get_traced_memory()[0]
+        timing.peak_bytes = 0
+    open_stages.append(timing)
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing.seconds = time.perf_counter() - start
+        if tracing and tracemalloc.is_tracing():
+            _update_peaks(open_stages)
+        open_stages.pop()
+        logger.debug(json.dumps(timing.as_dict()))
+        if _enabled:
+            with _lock:
+                _records.append(timing)
+
+
+def _update_peaks(open_stages: List[StageTiming]) -> None:
+    peak = tracemalloc.get_traced_memory()[1]
+    for timing in open_stages:
+        if timing.peak_bytes is not None:
+            timing.peak_bytes = max(timing.peak_bytes, peak - timing.base_bytes)
+
+
+def summary(records: List[StageTiming]) -> str:
+    """
+    A table of the total time, rows and peak memory of each stage
+
+    Stages with the same name are added together; the peak is the largest of them.
+
+    :param records: List[StageTiming], from collect()
+    :return: str
+    """
+    totals: Dict[str, StageTiming] = {}
+    counts: Dict[str, int] = {}
+    for record in records:
+        total = totals.setdefault(record.name, StageTiming(record.name))
+        counts[record.name] = counts.get(record.name, 0) + 1
+        total.seconds += record.seconds
+        if record.rows is not None:
+            total.rows = (total.rows or 0) + record.rows
+        if record.peak_bytes is not None:
+            total.peak_bytes = max(total.peak_bytes or 0, record.peak_bytes)
+    lines = [
+        f"{'Stage':<20} {'Calls':>6} {'Seconds':>9} {'Rows':>10} "
+        f"{'Rows/s':>11} {'Peak MiB':>9}"
+    ]
+    for name, total in totals.items():
+        rows = "" if total.rows is None else f"{total.rows:,}"
+        rate = (
+            f"{total.rows / total.seconds:,.0f}"
+            if total.rows is not None and total.seconds > 0
+            else ""
+        )
+        peak = "" if total.peak_bytes is None else f"{total.peak_bytes / 2**20:.1f}"
+        lines.append(
+            f"{name:<20} {counts[name]:>6} {total.seconds:>9.3f} {rows:>10} "
+            f"{rate:>11} {peak:>9}"
+        )
+    return "\n".join(lines)
@@ -1,24 +1,32 @@
 import logging
 from pathlib import Path
+from typing import Any, Optional, Tuple
 
 from PyQt5 import QtWidgets, QtGui, QtCore
 
 from constants import INPUT_TEAMS_FRAME, INPUT_STUDENT_FRAME
 from helpers import valid_extension
-from process import assignment_name, assignment_file_name, class_period
+from model import TeamsExport, class_period
+from sniff import sniff
+from worker import PreloadWorker
 
 logger = logging.getLogger(__name__)
 
 
 class QFrameDragDrop(QtWidgets.QFrame):
     setOutputDir = QtCore.pyqtSignal(str)
+    # The file has been parsed in the background, see preloaded()
+    preloadFinished = QtCore.pyqtSignal()
 
     def __init__(self, parent) -> None:
         super(QFrameDragDrop, self).__init__(parent)
         self.setAcceptDrops(True)
         self.file_path: Path = Path()
-        self.assignment_name: str = ""
-        self.assignment_file_name: str = ""
+        self.export: Optional[TeamsExport] = None  # For a Teams export
+        # The StudentRoster, or for a Teams export the result of read_grades
+        self.__preloaded: Optional[Any] = None
+        self.__preloaded_signature: Optional[Tuple[int, int]] = None
+        self.__preload: Optional[PreloadWorker] = None
         logger.debug(f"QFrameDragDrop initialized\nParent: {self.parent()}")
 
     def dragEnterEvent(self, event: QtGui.QDragEnterEvent) -> None:
@@ -42,11 +50,20 @@ class QFrameDragDrop(QtWidgets.QFrame):
 
     def __process_event(self, file: Path, event: QtGui.QDropEvent) -> None:
         logger.debug(f"Processing file drag event: {file.name}")
-        if "grades" in file.name and self.objectName() == INPUT_TEAMS_FRAME:
-            logger.debug("File met 'grades' criteria")
-            event.accept()
-        elif "Student Portal" in file.name and self.objectName() == INPUT_STUDENT_FRAME:
-            logger.debug("File met 'student logins' criteria")
+        kind = sniff(file)  # Only reads the start of the file
+        if kind.is_teams and self.objectName() == INPUT_TEAMS_FRAME:
+            logger.debug(
+                f"File is a Teams export with {kind.assignments} assignment(s)"
+            )
+            try:
+                class_period(file)
+            except ValueError as e:  # Outputs can't be named without it
+                logger.debug(f"{e} -- rejecting")
+                event.ignore()
+            else:
+                event.accept()
+        elif kind.is_roster and self.objectName() == INPUT_STUDENT_FRAME:
+            logger.debug("File is a student logins workbook")
             event.accept()
         else:
             logger.debug("File did not meet any criteria -- rejecting")
@@ -57,16 +74,80 @@ class QFrameDragDrop(QtWidgets.QFrame):
         if self.file_path.is_file():
             if self.objectName() == INPUT_TEAMS_FRAME:
                 logger.info("Processing for grades...")
-                # TODO: If there are multiple assignments present in file?
-                self.assignment_name = assignment_name(self.file_path)
-                self.assignment_file_name = assignment_file_name(
-                    assignment=self.assignment_name, period=class_period(self.file_path)
-                )
-                self.setWindowIconText(f"{self.assignment_file_name}.xlsx")
+                try:
+                    self.export = TeamsExport.from_file(self.file_path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Unable to read {self.file_path.name}: {e}")
+                    self.export = None
+                    QtWidgets.QMessageBox.warning(
+                        self, "Unable to read file", f"{self.file_path.name}:\n{e}"
+                    )
+                    self.file_path = Path()  # So that Process asks for a file
+                    return
+                output_text = f"{self.export.latest.file_name}.xlsx"
+                if len(self.export) > 1:
+                    output_text += f" (+{len(self.export) - 1} more)"
+                self.setWindowIconText(output_text)
                 self.setOutputDir.emit(str(self.file_path.parent))
                 logger.info("Finished processing")
                 logger.debug(f"File(s) that may be exported: {self.windowIconText()}")
             self.findChild(QtWidgets.QPushButton).setText(self.file_path.name)
             logger.debug("'button' text changed")
+            self.__start_preload()
         else:
             logger.warning(f"file_path not properly set: {self.file_path}")
+
+    def __start_preload(self) -> None:
+        # Parse the file now, so that Process doesn't have to wait for it
+        if self.__preload is not None:
+            self.__preload.cancel()  # For the file dropped before this one
+        self.__preloaded = None
+        self.__preloaded_signature = _signature(self.file_path)
+        worker = PreloadWorker(
+            self.file_path, roster=self.objectName() == INPUT_STUDENT_FRAME
+        )
+        worker.signals.finished.connect(self.__on_preloaded)
+        self.__preload = worker
+        QtCore.QThreadPool.globalInstance().start(worker)
+
+    def __on_preloaded(self, result: Any) -> None:
+        if self.__preload is None or self.sender() is not self.__preload.signals:
+            return  # Another file was dropped since
+        self.__preload = None
+        self.__preloaded = result
+        if self.objectName() == INPUT_STUDENT_FRAME:
+            preview = f"{len(result):,} students"
+        else:
+            names, grades = result
+            students = len(grades) // len(names)
+            preview = f"{students:,} students, {len(names)} assignment(s)"
+        logger.info(f"Preloaded {self.file_path.name}: {preview}")
+        self.findChild(QtWidgets.QPushButton).setText(
+            f"{self.file_path.name}\n{preview}"
+        )
+        self.preloadFinished.emit()
+
+    def preloaded(self) -> Optional[Any]:
+        """
+        What the file was parsed into in the background, if that has finished
+
+        For the student logins frame this is the StudentRoster, and for the Teams frame
+        the names and grades from process.read_grades. None if the file has changed
+        on disk since.
+
+        :return: Optional[Any]
+        """
+        if self.__preloaded is None:
+            return None
+        try:
+            if _signature(self.file_path) == self.__preloaded_signature:
+                return self.__preloaded
+        except OSError:
+            pass
+        logger.info(f"{self.file_path.name} changed since it was preloaded")
+        return None
+
+
+def _signature(file: Path) -> Tuple[int, int]:
+    stat = file.stat()
+    return stat.st_mtime_ns, stat.st_size
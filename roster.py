@@ -0,0 +1,408 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+import constants
+from helpers import file_hash
+from profiling import stage
+from roster_cache import RosterCache
+
+logger = logging.getLogger(__name__)
+
+
+class StudentRoster:
+    """
+    A Student Portal logins workbook, parsed once and kept ready for matching
+
+    Reading the workbook is the slowest part of generating an output, so a roster is
+    loaded once and handed to every export that needs it. The file's modification time
+    and size are remembered so that a changed file can be detected and reloaded.
+
+    If a RosterCache is given, the parsed columns are looked up by the workbook's
+    content hash first, and stored there after a fresh parse.
+    """
+
+    def __init__(self, file: Path, cache: Optional[RosterCache] = None) -> None:
+        self.file: Path = Path(file)
+        self.mtime, self.size = _file_signature(self.file)
+        with stage("roster.load") as timing:
+            self.content_hash: str = file_hash(self.file)
+            self.students: pd.DataFrame = self.__load(cache)
+            timing.rows = len(self.students)
+        with stage("roster.index", rows=len(self.students)):
+            self.build_index()
+
+    def __load(self, cache: Optional[RosterCache]) -> pd.DataFrame:
+        if cache is None:
+            return self.__read_workbook()
+        columns = cache.get(self.content_hash)
+        if columns is not None:
+            logger.info(f"Student login file {self.file.name} loaded from cache")
+            return pd.DataFrame(columns)
+        students = self.__read_workbook()
+        cache.put(
+            self.content_hash,
+            {name: _cacheable(students[name]) for name in students.columns},
+        )
+        return students
+
+    def __read_workbook(self) -> pd.DataFrame:
+        logger.info(f"Loading student login file {self.file.name}...")
+        students = read_logins(self.file)
+        logger.debug("Student login file loaded")
+        students["Username"] = students["Username"].str.partition("@")[0]
+        logger.debug("Student usernames split")
+        return students
+
+    def build_index(self) -> None:
+        """
+        Build the username hash index used by lookup() from self.students
+
+        Matching is then a single vectorized lookup instead of a merge. A username
+        listed more than once keeps its first student ID; usernames listed with more
+        than one student ID are kept in self.conflicts, and logged.
+
+        :return: None
+        """
+        usernames = self.students["Username"]
+        duplicated = usernames.duplicated()
+        self.conflicts: pd.DataFrame = self.students.iloc[0:0]
+        if duplicated.any():
+            repeated = self.students[usernames.isin(usernames[duplicated])]
+            ids = repeated.groupby("Username")["StuID"].nunique()
+            conflicting = repeated["Username"].isin(ids[ids > 1].index)
+            self.conflicts = repeated[conflicting].sort_values(
+                "Username", kind="stable"
+            )
+            if len(self.conflicts):
+                logger.warning(
+                    f"Usernames with more than one student ID, using the first: "
+                    f"{_describe_conflicts(self.conflicts)}"
+                )
+        unique = self.students[~duplicated]
+        self.index: pd.Index = pd.Index(unique["Username"])
+        # Student IDs are stored in the smallest integer type that holds them
+        self.stuids: np.ndarray = _compact(unique["StuID"]).to_numpy()
+        # Whether each username in the index is one of the conflicts
+        self.ambiguous: np.ndarray = self.index.isin(self.conflicts["Username"])
+        self.__trigrams: Optional[Dict[str, np.ndarray]] = None  # See suggest()
+        logger.debug(f"Roster index built for {len(self.index)} usernames")
+
+    def locate(self, usernames: np.ndarray) -> np.ndarray:
+        """
+        Positions of an array of usernames in the index, -1 for any not in the roster
+
+        :param usernames: np.ndarray, usernames without the "@domain"
+        :return: np.ndarray
+        """
+        return self.index.get_indexer(usernames)
+
+    def lookup(self, usernames: np.ndarray) -> np.ndarray:
+        """
+        Student IDs for an array of usernames, NaN for any not in the roster
+
+        :param usernames: np.ndarray, usernames without the "@domain"
+        :return: np.ndarray
+        """
+        return self.stuids_at(self.locate(usernames))
+
+    def stuids_at(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Student IDs at positions from locate(), NaN where the position is -1
+
+        :param positions: np.ndarray
+        :return: np.ndarray
+        """
+        if len(self.stuids) == 0:
+            return np.full(len(positions), np.nan)
+        missing = positions == -1
+        stuids = self.stuids.take(positions)  # -1 picks the last ID, replaced below
+        if missing.any():
+            if stuids.dtype.kind in "biu":
+                stuids = stuids.astype(float)
+            elif stuids.dtype.kind != "f":
+                stuids = stuids.astype(object)
+            stuids[missing] = np.nan
+        return stuids
+
+    def suggest(
+        self, username: str, limit: int = constants.SUGGESTION_LIMIT
+    ) -> List[str]:
+        """
+        Usernames in the roster that are close to one that is not, best first
+
+        Closeness is the share of trigrams (runs of three characters) the two have in
+        common. The trigram index is built the first time it is needed; after that
+        each call only scores the usernames sharing a trigram with this one, and only
+        sorts the best few of them.
+
+        :param username: str
+        :param limit: int, most suggestions to give
+        :return: List[str]
+        """
+        if self.__trigrams is None:
+            self.__build_trigrams()
+        wanted = _trigrams(username)
+        postings = [self.__trigrams[t] for t in wanted if t in self.__trigrams]
+        if not postings:
+            return []
+        found = np.concatenate(postings)
+        # Positions (in order) of the usernames sharing a trigram, and how many they
+        # share. Counting into an array the size of the roster is quicker once the
+        # trigrams are common enough to be shared by a good part of it.
+        if len(found) * constants.SUGGESTION_DENSE_RATIO < len(self.index):
+            candidates, shared = np.unique(found, return_counts=True)
+        else:
+            shared = np.bincount(found, minlength=len(self.index))
+            candidates = np.flatnonzero(shared)
+            shared = shared[candidates]
+        scores = shared / (len(wanted) + self.__trigram_counts[candidates] - shared)
+        if len(candidates) > limit:
+            # The best limit, with ties at the cut going to the earliest in the roster
+            cut = -np.partition(-scores, limit - 1)[limit - 1]
+            above = np.flatnonzero(scores > cut)
+            tied = np.flatnonzero(scores == cut)[: limit - len(above)]
+            keep = np.sort(np.concatenate([above, tied]))
+            candidates, scores = candidates[keep], scores[keep]
+        order = np.argsort(-scores, kind="stable")
+        order = order[scores[order] >= constants.SUGGESTION_MIN_SCORE]
+        return [str(name) for name in self.index[candidates[order]]]
+
+    def __build_trigrams(self) -> None:
+        with stage("roster.trigrams", rows=len(self.index)):
+            postings: Dict[str, List[int]] = {}
+            counts = np.zeros(len(self.index), dtype=np.int32)
+            for position, name in enumerate(self.index):
+                trigrams = _trigrams(str(name))
+                counts[position] = len(trigrams)
+                for trigram in trigrams:
+                    postings.setdefault(trigram, []).append(position)
+            self.__trigrams = {
+                trigram: np.array(positions, dtype=np.int32)
+                for trigram, positions in postings.items()
+            }
+            self.__trigram_counts: np.ndarray = counts
+
+    def __len__(self) -> int:
+        return len(self.students)
+
+    def is_current(self) -> bool:
+        """
+        Check that the file on disk has not changed since it was loaded
+
+        :return: bool
+        """
+        try:
+            return _file_signature(self.file) == (self.mtime, self.size)
+        except FileNotFoundError:
+            return False
+
+
+def read_logins(file: Path) -> pd.DataFrame:
+    """
+    Read the columns in constants.STUDENT_LOGINS from a Student Portal logins workbook
+
+    .xlsx workbooks are streamed with openpyxl in read-only mode, touching only the
+    header row and the cells between the wanted columns, rather than building a frame
+    of every column (passwords, reset dates and all) first. Other formats (.xls) are
+    read with pandas.
+
+    :param file: Path
+    :return: pd.DataFrame, with just the wanted columns
+    """
+    if file.suffix.lower() != ".xlsx":
+        return pd.read_excel(file, **constants.STUDENT_LOGINS)
+    from openpyxl import load_workbook
+
+    header_row = constants.STUDENT_LOGINS["header"] + 1  # openpyxl counts from 1
+    wanted = constants.STUDENT_LOGINS["usecols"]
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()  # Some exporters write a wrong size, don't trust it
+        header = next(
+            sheet.iter_rows(min_row=header_row, max_row=header_row, values_only=True),
+            (),
+        )
+        header = [str(name).strip() if name is not None else "" for name in header]
+        missing = [name for name in wanted if name not in header]
+        if missing:
+            raise ValueError(f"Columns {missing} not found in {file.name}")
+        positions = [header.index(name) for name in wanted]
+        first, last = min(positions), max(positions)
+        offsets = [position - first for position in positions]
+        columns = [[] for _ in wanted]
+        for row in sheet.iter_rows(
+            min_row=header_row + 1,
+            min_col=first + 1,
+            max_col=last + 1,
+            values_only=True,
+        ):
+            values = [row[offset] if offset < len(row) else None for offset in offsets]
+            if all(value is None for value in values):  # Blank line
+                continue
+            for column, value in zip(columns, values):
+                column.append(value)
+    finally:
+        workbook.close()  # Read-only workbooks keep the file open until closed
+    # Same types as read_excel would give: ints, floats if any are missing, else objects
+    return pd.DataFrame(
+        {name: pd.Series(column, dtype=None) for name, column in zip(wanted, columns)}
+    )
+
+
+class RosterSet(StudentRoster):
+    """
+    Several Student Portal logins workbooks (one per teacher, say) used as one roster
+
+    Students listed in more than one workbook are only kept once. A username given
+    a different student ID in another workbook is a conflict: the first workbook's ID
+    is used, and the conflicting rows, with the workbook each came from, are kept in
+    self.conflicts.
+    """
+
+    def __init__(self, rosters: Sequence[StudentRoster]) -> None:
+        # The member rosters are already loaded, so StudentRoster.__init__ is not used
+        self.rosters: List[StudentRoster] = list(rosters)
+        self.file: Path = self.rosters[0].file
+        self.content_hash: str = hashlib.sha256(
+            "".join(roster.content_hash for roster in self.rosters).encode()
+        ).hexdigest()
+        with stage("roster.combine") as timing:
+            self.students: pd.DataFrame = self.__combine()
+            timing.rows = len(self.students)
+        with stage("roster.index", rows=len(self.students)):
+            self.build_index()
+
+    def __combine(self) -> pd.DataFrame:
+        students = pd.concat(
+            [roster.students for roster in self.rosters], ignore_index=True
+        )
+        # Which workbook each student came from, as a small integer code per row
+        students["Source"] = pd.Categorical.from_codes(
+            np.repeat(
+                np.arange(len(self.rosters)),
+                [len(roster.students) for roster in self.rosters],
+            ),
+            categories=[str(roster.file) for roster in self.rosters],
+        )
+        students = students.drop_duplicates(subset=["Username", "StuID"])
+        logger.info(
+            f"{len(students)} students from {len(self.rosters)} student login files"
+        )
+        return students.reset_index(drop=True)
+
+    def is_current(self) -> bool:
+        return all(roster.is_current() for roster in self.rosters)
+
+
+_rosters: Dict[Path, StudentRoster] = {}
+_roster_sets: Dict[Tuple[Path, ...], RosterSet] = {}
+# Held while loading, so that a file being preloaded by the GUI is not also read by
+# the processing thread: the second caller waits, then reuses the first one's roster
+_rosters_lock = threading.Lock()
+
+
+def load_roster(file: Path, use_cache: bool = True) -> StudentRoster:
+    """
+    Get the roster for a student logins file, reusing an earlier load if still current
+
+    :param file: Path
+    :param use_cache: bool, also use the on-disk roster cache
+    :return: StudentRoster
+    """
+    key = Path(file).resolve()
+    with _rosters_lock:
+        roster = _rosters.get(key)
+        if roster is not None and roster.is_current():
+            logger.debug(f"Reusing loaded roster for {key.name}")
+            return roster
+        if roster is not None:
+            logger.info(f"{key.name} changed on disk, reloading")
+        roster = StudentRoster(key, cache=RosterCache() if use_cache else None)
+        _rosters[key] = roster
+        return roster
+
+
+def load_rosters(files: Union[Path, Sequence[Path]], workers: int = 0) -> StudentRoster:
+    """
+    Get one roster for one or more student logins files
+
+    With several files, those not already loaded are read in parallel processes and
+    combined into a RosterSet, which is reused while none of the files change.
+
+    :param files: Union[Path, Sequence[Path]]
+    :param workers: int, processes to read files with; 0 for one per CPU
+    :return: StudentRoster, a RosterSet if there is more than one file
+    """
+    if isinstance(files, (str, Path)):
+        files = [files]
+    keys = tuple(dict.fromkeys(Path(file).resolve() for file in files))
+    if len(keys) == 1:
+        return load_roster(keys[0])
+    roster_set = _roster_sets.get(keys)
+    if roster_set is not None and roster_set.is_current():
+        logger.debug(f"Reusing loaded rosters for {len(keys)} files")
+        return roster_set
+    stale = [
+        key for key in keys if key not in _rosters or not _rosters[key].is_current()
+    ]
+    workers = min(workers or os.cpu_count() or 1, len(stale))
+    if workers > 1:
+        logger.info(f"Loading {len(stale)} student login files in {workers} processes")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for key, roster in zip(stale, executor.map(_read_roster, stale)):
+                _rosters[key] = roster
+    roster_set = RosterSet([load_roster(key) for key in keys])
+    _roster_sets[keys] = roster_set
+    return roster_set
+
+
+def _read_roster(file: Path) -> StudentRoster:
+    return StudentRoster(file, cache=RosterCache())
+
+
+def _describe_conflicts(conflicts: pd.DataFrame) -> str:
+    # "user: 1001, 1002" or, if known, "user: 1001 (file), 1002 (other file)"
+    described: List[str] = []
+    for username, rows in conflicts.groupby("Username", sort=False):
+        if "Source" in rows:
+            ids = [
+                f"{stuid} ({Path(source).name})"
+                for stuid, source in zip(rows["StuID"], rows["Source"])
+            ]
+        else:
+            ids = [str(stuid) for stuid in rows["StuID"].unique()]
+        described.append(f"{username}: {', '.join(ids)}")
+    return "; ".join(described)
+
+
+def _trigrams(text: str) -> Set[str]:
+    # Padded so that the start and end of short names count too
+    padded = f"  {text.lower()} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _compact(column: pd.Series) -> pd.Series:
+    if column.dtype.kind in "iu":
+        return pd.to_numeric(column, downcast="integer")
+    return column
+
+
+def _file_signature(file: Path) -> Tuple[int, int]:
+    stat = file.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _cacheable(column: pd.Series) -> np.ndarray:
+    # Anything but plain numbers would need pickle to be stored, so keep it as strings
+    if column.dtype.kind in "biuf":
+        return column.to_numpy()
+    return column.to_numpy(dtype=str)
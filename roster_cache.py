@@ -0,0 +1,120 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+import constants
+from helpers import user_data_dir
+
+# On-disk cache of parsed Student Portal rosters.
+# Entries are keyed by the SHA-256 of the workbook's contents plus a version stamp, so
+# a changed workbook, a new cache format, or a change to constants.STUDENT_LOGINS all
+# miss the cache instead of returning stale data. Entries are plain NumPy .npz files
+# (loaded with allow_pickle=False) and the least recently used ones are evicted once
+# the cache grows past constants.ROSTER_CACHE_MAX_BYTES.
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUFFIX: str = ".npz"
+
+
+def cache_version() -> str:
+    """
+    Stamp identifying the cache format and roster schema that wrote an entry
+
+    :return: str
+    """
+    schema = f"{constants.ROSTER_CACHE_FORMAT}:{constants.STUDENT_LOGINS!r}"
+    return hashlib.sha256(schema.encode()).hexdigest()[:12]
+
+
+def default_cache_dir() -> Path:
+    return user_data_dir().joinpath("roster_cache")
+
+
+class RosterCache:
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_bytes: int = constants.ROSTER_CACHE_MAX_BYTES,
+    ) -> None:
+        self.directory: Path = directory or default_cache_dir()
+        self.max_bytes: int = max_bytes
+        self.version: str = cache_version()
+
+    def entry_path(self, content_hash: str) -> Path:
+        return self.directory.joinpath(f"{content_hash}-{self.version}{CACHE_SUFFIX}")
+
+    def get(self, content_hash: str) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Load the cached columns for a workbook, if present
+
+        :param content_hash: str, from helpers.file_hash
+        :return: Optional[Dict[str, np.ndarray]], keyed by column name
+        """
+        entry = self.entry_path(content_hash)
+        try:
+            with np.load(entry, allow_pickle=False) as data:
+                columns = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            logger.debug(f"Roster cache miss: {entry.name}")
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(
+                f"Discarding unreadable roster cache entry {entry.name}: {e}"
+            )
+            entry.unlink(missing_ok=True)
+            return None
+        os.utime(entry)  # Mark as recently used
+        logger.debug(f"Roster cache hit: {entry.name}")
+        return columns
+
+    def put(self, content_hash: str, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Store the parsed columns for a workbook, then evict old entries if needed
+
+        :param content_hash: str, from helpers.file_hash
+        :param columns: Dict[str, np.ndarray], keyed by column name
+        :return: None
+        """
+        entry = self.entry_path(content_hash)
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp = entry.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                np.savez(f, **columns)
+            os.replace(tmp, entry)
+        except OSError as e:
+            logger.warning(f"Unable to write roster cache entry {entry.name}: {e}")
+            return
+        logger.debug(f"Roster cache stored: {entry.name}")
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries until the cache fits in max_bytes
+
+        Entries written under a different version stamp can never be hit again, so
+        they are always removed first.
+
+        :return: None
+        """
+        current_suffix = f"-{self.version}{CACHE_SUFFIX}"
+        entries = []
+        for entry in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            current = entry.name.endswith(current_suffix)
+            entries.append((current, stat.st_mtime, stat.st_size, entry))
+        total = sum(size for _, _, size, _ in entries)
+        for current, _, size, entry in sorted(entries):
+            if current and total <= self.max_bytes:
+                break
+            logger.debug(f"Evicting roster cache entry {entry.name}")
+            entry.unlink(missing_ok=True)
+            total -= size
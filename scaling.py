@@ -0,0 +1,96 @@
+import logging
+from typing import NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+from profiling import stage
+
+# Scaling of grades between matching and writing: as a percentage of the assignment's
+# total, rescaled to be out of some other number of points, rounded and clamped.
+# Works on whole columns of the long grades table (see process.read_grades), so every
+# assignment of an export is scaled at once, each by its own totals.
+
+logger = logging.getLogger(__name__)
+
+
+class GradeScale(NamedTuple):
+    percent: bool = False  # Points as a percentage of the assignment's total
+    points: Optional[float] = None  # Rescaled to be out of this many points
+    decimals: Optional[int] = None  # Rounded (half up) to this many decimal places
+    clamp: bool = False  # Kept between 0 and the (new) total
+
+    @property
+    def target(self) -> Optional[float]:
+        """The total that points are rescaled to, or None to keep the original"""
+        return 100.0 if self.percent else self.points
+
+    @property
+    def is_identity(self) -> bool:
+        return self == NO_SCALE
+
+
+NO_SCALE: GradeScale = GradeScale()
+
+
+def validate(scale: GradeScale) -> None:
+    """
+    Check that a scale makes sense, before any file is processed with it
+
+    :param scale: GradeScale
+    :return: None
+    """
+    if scale.percent and scale.points is not None:
+        raise ValueError("Grades can be scaled to a percentage or to points, not both")
+    if scale.points is not None and not scale.points > 0:
+        raise ValueError(
+            f"Grades must be rescaled to more than 0 points: {scale.points}"
+        )
+    if scale.decimals is not None and scale.decimals < 0:
+        raise ValueError(f"Decimal places can't be negative: {scale.decimals}")
+
+
+def scale_grades(grades: pd.DataFrame, scale: GradeScale) -> pd.DataFrame:
+    """
+    Apply a GradeScale to the Points (and Total) columns of a grades table
+
+    Rows whose total is missing or not above 0 can't be rescaled, and are left
+    without points. Points that are missing stay missing.
+
+    :param grades: pd.DataFrame, from process.read_grades or process.match_grades
+    :param scale: GradeScale
+    :return: pd.DataFrame, a copy with the scaled columns
+    """
+    if scale.is_identity:
+        return grades
+    validate(scale)
+    with stage("scale", rows=len(grades)):
+        points = grades["Points"].to_numpy(dtype=float)
+        totals = grades["Total"].to_numpy(dtype=float)
+        target = scale.target
+        if target is not None:
+            usable = totals > 0  # False for NaN too
+            unscalable = int(np.count_nonzero(~usable & ~np.isnan(points)))
+            if unscalable:
+                logger.warning(
+                    f"{unscalable} grade(s) have no total to scale by, left blank"
+                )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                points = np.where(usable, points * target / totals, np.nan)
+            totals = np.where(usable, target, np.nan)
+        if scale.clamp:
+            # Comparisons with NaN are False, so missing points and totals are kept
+            points = np.where(points > totals, totals, points)
+            points = np.where(points < 0, 0.0, points)
+        if scale.decimals is not None:
+            points = _round_half_up(points, scale.decimals)
+        return grades.assign(Points=points, Total=totals)
+
+
+def _round_half_up(values: np.ndarray, decimals: int) -> np.ndarray:
+    # np.round rounds halves to even (89.5 to 90 but 88.5 to 88), which is not how
+    # grades are rounded. Rounding to 9 places first stops float error in the scaling
+    # (87.49999999999999 for 87.5) from deciding the direction.
+    factor = 10.0**decimals
+    shifted = np.round(np.abs(values) * factor, 9)
+    return np.copysign(np.floor(shifted + 0.5), values) / factor
@@ -0,0 +1,521 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import zipfile
+from collections import Counter, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Sequence, Union
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+import constants
+from roster import StudentRoster, load_rosters
+
+# HTTP service mode: the conversion as an API, for running once on a server.
+#
+#   POST /convert?filename=<Teams CSV name>[&all=1]
+#       Body: the Teams CSV itself (not a multipart form), sent with a Content-Length
+#       or chunked. Returns the ATLAS file for the most recent assignment, or with
+#       all=1 a zip of the files for every assignment (and any unmatched reports).
+#       The X-Unmatched-Students header counts students that could not be matched.
+#   GET  /          A page with a form for converting a file from a browser
+#   GET  /health    {"status": "ok"}
+#   GET  /metrics   Request counts, requests/sec and conversion latency percentiles
+#
+# Only the standard library is used. The rosters stay loaded (and are reloaded when
+# their files change); conversions run in a pool of worker processes, with at most
+# max_concurrent at once and max_pending waiting before requests are turned away.
+#
+# Try it with:  curl --data-binary @"grades P01.csv" -o out.xlsx \
+#                    "http://127.0.0.1:8765/convert?filename=grades%20P01.csv"
+
+logger = logging.getLogger(__name__)
+
+XLSX_TYPE: str = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+READ_CHUNK_BYTES: int = 64 * 1024
+RETRY_AFTER_SECONDS: int = 1  # Suggested to clients turned away when busy
+REASONS: Dict[int, str] = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+FORM_PAGE: str = """<!doctype html>
+<html><head><meta charset="utf-8"><title>TeamsAtlasBridge</title></head>
+<body>
+<h1>TeamsAtlasBridge</h1>
+<form id="form">
+  <p><input type="file" id="file" accept=".csv" required></p>
+  <p><label><input type="checkbox" id="all"> Every assignment (as a zip)</label></p>
+  <p><button>Convert</button></p>
+</form>
+<p id="message"></p>
+<script>
+document.getElementById("form").onsubmit = async (event) => {
+  event.preventDefault();
+  const file = document.getElementById("file").files[0];
+  const all = document.getElementById("all").checked ? "&all=1" : "";
+  const message = document.getElementById("message");
+  message.textContent = "Converting...";
+  const response = await fetch(
+    "/convert?filename=" + encodeURIComponent(file.name) + all,
+    {method: "POST", body: file}
+  );
+  if (!response.ok) {
+    message.textContent = (await response.json()).error;
+    return;
+  }
+  const disposition = response.headers.get("Content-Disposition");
+  const name = decodeURIComponent(disposition.split("UTF-8''")[1]);
+  const link = document.createElement("a");
+  link.href = URL.createObjectURL(await response.blob());
+  link.download = name;
+  link.click();
+  const unmatched = response.headers.get("X-Unmatched-Students");
+  message.textContent = "Done: " + name +
+    (unmatched !== "0" ? " (" + unmatched + " student(s) not matched)" : "");
+};
+</script>
+</body></html>
+"""
+
+
+class HttpError(Exception):
+    def __init__(
+        self, status: int, message: str, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        super(HttpError, self).__init__(message)
+        self.status: int = status
+        self.headers: Dict[str, str] = headers or {}
+
+
+class Request:
+    def __init__(
+        self, method: str, path: str, query: Dict[str, str], headers: Dict[str, str]
+    ) -> None:
+        self.method: str = method
+        self.path: str = path
+        self.query: Dict[str, str] = query
+        self.headers: Dict[str, str] = headers  # Names in lower case
+
+
+class Metrics:
+    """
+    Request counts and the latency of recent conversions
+
+    Requests/sec is measured over the last minute; latency percentiles over the last
+    constants.SERVICE_LATENCY_WINDOW successful conversions.
+    """
+
+    def __init__(self, window: int = constants.SERVICE_LATENCY_WINDOW) -> None:
+        self.started: float = time.monotonic()
+        self.requests: int = 0
+        self.statuses: Counter = Counter()
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.__recent: Deque[float] = (
+            deque()
+        )  # When each request in the last minute was
+
+    def record(self, status: int, seconds: float, conversion: bool) -> None:
+        now = time.monotonic()
+        self.requests += 1
+        self.statuses[status] += 1
+        if conversion and status == 200:
+            self.latencies.append(seconds)
+        self.__recent.append(now)
+        while self.__recent and self.__recent[0] < now - 60:
+            self.__recent.popleft()
+
+    def snapshot(self) -> Dict[str, object]:
+        uptime = time.monotonic() - self.started
+        while self.__recent and self.__recent[0] < time.monotonic() - 60:
+            self.__recent.popleft()
+        latencies = sorted(self.latencies)
+        return {
+            "uptime_seconds": round(uptime, 1),
+            "requests": self.requests,
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+            "requests_per_sec": round(len(self.__recent) / min(max(uptime, 1), 60), 3),
+            "conversion_latency_ms": {
+                f"p{p}": (
+                    round(_percentile(latencies, p) * 1000, 1) if latencies else None
+                )
+                for p in (50, 90, 99)
+            },
+        }
+
+
+def _percentile(values: List[float], percent: int) -> float:
+    # Nearest-rank percentile of sorted values
+    rank = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+    return values[rank]
+
+
+class BridgeService:
+    """
+    The conversion as an HTTP service, see the top of this module
+
+    start() binds the server; port 0 picks a free port, which is then in self.port.
+    """
+
+    def __init__(
+        self,
+        student_list: Union[Path, Sequence[Path]],
+        workers: int = 1,
+        max_concurrent: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        max_upload_bytes: int = constants.SERVICE_MAX_UPLOAD_BYTES,
+    ) -> None:
+        self.student_list: Union[Path, Sequence[Path]] = student_list
+        self.workers: int = workers or os.cpu_count() or 1
+        self.max_concurrent: int = max_concurrent or self.workers
+        self.max_pending: int = (
+            max_pending if max_pending is not None else 2 * self.max_concurrent
+        )
+        self.max_upload_bytes: int = max_upload_bytes
+        self.metrics: Metrics = Metrics()
+        self.port: int = 0
+        self.__roster: StudentRoster = load_rosters(student_list)
+        self.__executor: Executor = self.__new_executor()
+        self.__roster_lock = asyncio.Lock()
+        self.__slots = asyncio.Semaphore(self.max_concurrent)
+        self.__queued: int = 0  # Conversions running or waiting for a slot
+        self.__server: Optional[asyncio.AbstractServer] = None
+
+    def __new_executor(self) -> Executor:
+        # The roster is handed to each worker once, when it starts
+        if self.workers == 1:
+            return ThreadPoolExecutor(
+                1, initializer=_init_worker, initargs=(self.__roster,)
+            )
+        return ProcessPoolExecutor(
+            self.workers, initializer=_init_worker, initargs=(self.__roster,)
+        )
+
+    async def start(self, host: str, port: int) -> None:
+        self.__server = await asyncio.start_server(self.__handle, host, port)
+        self.port = self.__server.sockets[0].getsockname()[1]
+        logger.info(f"Serving on http://{host}:{self.port}/")
+
+    async def serve_forever(self, host: str, port: int) -> None:
+        await self.start(host, port)
+        try:
+            await self.__server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.__server is not None:
+            self.__server.close()
+        self.__executor.shutdown(wait=False)
+
+    async def __current_roster(self) -> None:
+        # Reload (off the event loop) if a student logins file has changed
+        async with self.__roster_lock:
+            if self.__roster.is_current():
+                return
+            logger.info("Student logins changed, reloading")
+            loop = asyncio.get_running_loop()
+            self.__roster = await loop.run_in_executor(
+                None, load_rosters, self.student_list
+            )
+            old, self.__executor = self.__executor, self.__new_executor()
+            old.shutdown(wait=False)  # Conversions already running still finish
+
+    async def __handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        start = time.perf_counter()
+        conversion = False
+        try:
+            request = await _read_request(reader)
+            conversion = request.path == "/convert"
+            status = await self.__route(request, reader, writer)
+        except HttpError as e:
+            status = e.status
+            await _respond_json(writer, status, {"error": str(e)}, e.headers)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception:
+            logger.exception("Request failed")
+            status = 500
+            # Details are only logged, they may include the server's paths
+            await _respond_json(writer, status, {"error": REASONS[status]})
+        finally:
+            writer.close()
+        self.metrics.record(status, time.perf_counter() - start, conversion)
+
+    async def __route(
+        self,
+        request: Request,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> int:
+        routes = {
+            "/": "GET",
+            "/health": "GET",
+            "/metrics": "GET",
+            "/convert": "POST",
+        }
+        if request.path not in routes:
+            raise HttpError(404, f"No such endpoint: {request.path}")
+        if request.method != routes[request.path]:
+            raise HttpError(405, f"Use {routes[request.path]} for {request.path}")
+        if request.path == "/":
+            await _respond(
+                writer, 200, {"Content-Type": "text/html"}, FORM_PAGE.encode()
+            )
+        elif request.path == "/health":
+            await _respond_json(writer, 200, {"status": "ok"})
+        elif request.path == "/metrics":
+            metrics = self.metrics.snapshot()
+            metrics.update(
+                conversions_queued=self.__queued,
+                max_concurrent=self.max_concurrent,
+                students=len(self.__roster),
+            )
+            await _respond_json(writer, 200, metrics)
+        else:
+            await self.__convert(request, reader, writer)
+        return 200
+
+    async def __convert(
+        self,
+        request: Request,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        if self.__queued >= self.max_concurrent + self.max_pending:
+            raise HttpError(
+                503,
+                "Too many conversions waiting, try again shortly",
+                {"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+        every_assignment = request.query.get("all", "") in ("1", "true", "yes")
+        # Only the name is used, it must have the class period (P0x) in it
+        file_name = Path(request.query.get("filename", "upload.csv")).name
+        if file_name in ("", ".", ".."):
+            raise HttpError(400, "filename must be the name of the Teams CSV")
+        self.__queued += 1
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                # In a folder of its own, so that no name can clash with "out"
+                upload = Path(directory).joinpath("upload", file_name)
+                upload.parent.mkdir()
+                await self.__receive(request, reader, upload)
+                output_dir = Path(directory).joinpath("out")
+                output_dir.mkdir()
+                async with self.__slots:
+                    await self.__current_roster()
+                    loop = asyncio.get_running_loop()
+                    try:
+                        outputs = await loop.run_in_executor(
+                            self.__executor,
+                            _convert,
+                            upload,
+                            output_dir,
+                            every_assignment,
+                        )
+                    except ValueError as e:  # Not a usable Teams export
+                        raise HttpError(400, str(e))
+                    except OSError:  # Its message would show the server's paths
+                        logger.exception("Conversion failed")
+                        raise HttpError(500, "Unable to write the converted file")
+                await self.__send_outputs(writer, outputs, upload, every_assignment)
+        finally:
+            self.__queued -= 1
+
+    async def __receive(
+        self, request: Request, reader: asyncio.StreamReader, file: Path
+    ) -> None:
+        # Written to disk as it arrives, so large uploads are never all in memory
+        received = 0
+        with open(file, "wb") as f:
+            async for chunk in _body_chunks(request, reader):
+                received += len(chunk)
+                if received > self.max_upload_bytes:
+                    raise HttpError(
+                        413, f"Uploads are limited to {self.max_upload_bytes} bytes"
+                    )
+                f.write(chunk)
+        logger.debug(f"Received {received} bytes as {file.name}")
+
+    async def __send_outputs(
+        self,
+        writer: asyncio.StreamWriter,
+        outputs: List[Path],
+        upload: Path,
+        every_assignment: bool,
+    ) -> None:
+        from unmatched import report_file, summarize
+
+        summaries = summarize(outputs)
+        headers = {
+            "X-Unmatched-Students": str(sum(s.unmatched for s in summaries)),
+            "X-Ambiguous-Students": str(sum(s.ambiguous for s in summaries)),
+        }
+        if every_assignment:
+            result = upload.with_suffix(".zip")
+            with zipfile.ZipFile(result, "w", zipfile.ZIP_DEFLATED) as archive:
+                for output in outputs:
+                    archive.write(output, output.name)
+                    if report_file(output).exists():
+                        archive.write(report_file(output), report_file(output).name)
+            headers["Content-Type"] = "application/zip"
+        else:
+            result = outputs[0]
+            headers["Content-Type"] = XLSX_TYPE
+        headers["Content-Disposition"] = (
+            f"attachment; filename*=UTF-8''{quote(result.name)}"
+        )
+        await _respond_file(writer, 200, headers, result)
+
+
+async def _read_request(reader: asyncio.StreamReader) -> Request:
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise HttpError(400, "Request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    url = urlsplit(target)
+    query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+    return Request(method.upper(), unquote(url.path), query, headers)
+
+
+async def _body_chunks(request: Request, reader: asyncio.StreamReader):
+    if request.headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size_line = await reader.readuntil(b"\r\n")
+            try:
+                size = int(size_line.split(b";")[0], 16)
+            except ValueError:
+                raise HttpError(400, "Malformed chunked body")
+            if size == 0:
+                await reader.readuntil(b"\r\n")  # No trailers are expected
+                return
+            while size > 0:
+                chunk = await reader.readexactly(min(size, READ_CHUNK_BYTES))
+                size -= len(chunk)
+                yield chunk
+            await reader.readexactly(2)
+    else:
+        if "content-length" not in request.headers:
+            raise HttpError(411, "Send the CSV with a Content-Length, or chunked")
+        try:
+            remaining = int(request.headers["content-length"])
+        except ValueError:
+            raise HttpError(400, "Malformed Content-Length")
+        while remaining > 0:
+            chunk = await reader.readexactly(min(remaining, READ_CHUNK_BYTES))
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _head(status: int, headers: Dict[str, str], length: int) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    lines += [f"Content-Length: {length}", "Connection: close", "", ""]
+    return "\r\n".join(lines).encode("latin-1")
+
+
+async def _respond(
+    writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], body: bytes
+) -> None:
+    writer.write(_head(status, headers, len(body)) + body)
+    await writer.drain()
+
+
+async def _respond_json(
+    writer: asyncio.StreamWriter,
+    status: int,
+    body: Dict[str, object],
+    headers: Optional[Dict[str, str]] = None,
+) -> None:
+    headers = {"Content-Type": "application/json", **(headers or {})}
+    await _respond(writer, status, headers, json.dumps(body).encode())
+
+
+async def _respond_file(
+    writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], file: Path
+) -> None:
+    writer.write(_head(status, headers, file.stat().st_size))
+    with open(file, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+
+
+# Roster for the current worker, set once by _init_worker
+_worker_roster: Optional[StudentRoster] = None
+
+
+def _init_worker(roster: StudentRoster) -> None:
+    global _worker_roster
+    _worker_roster = roster
+
+
+def _convert(upload: Path, output_dir: Path, every_assignment: bool) -> List[Path]:
+    from model import TeamsExport
+    from process import generate_output_from_roster, generate_outputs
+
+    export = TeamsExport.from_file(upload)
+    if every_assignment:
+        return generate_outputs(
+            upload, _worker_roster, output_dir, period=export.period
+        )
+    output = output_dir.joinpath(f"{export.latest.file_name}.xlsx")
+    generate_output_from_roster(upload, _worker_roster, output)
+    return [output]
+
+
+def run_service(
+    student_list: Union[Path, Sequence[Path]],
+    host: str = constants.SERVICE_HOST,
+    port: int = constants.SERVICE_PORT,
+    workers: int = 1,
+    max_concurrent: Optional[int] = None,
+    max_pending: Optional[int] = None,
+) -> None:
+    """
+    Run the service until interrupted
+
+    :param student_list: Union[Path, Sequence[Path]], one or more student logins files
+    :param host: str, address to listen on; use "0.0.0.0" to accept other machines
+    :param port: int
+    :param workers: int, processes to convert in; 0 for one per CPU
+    :param max_concurrent: Optional[int], conversions at once, default one per worker
+    :param max_pending: Optional[int], conversions waiting before requests are refused
+    :return: None
+    """
+
+    async def main() -> None:
+        service = BridgeService(
+            student_list,
+            workers=workers,
+            max_concurrent=max_concurrent,
+            max_pending=max_pending,
+        )
+        await service.serve_forever(host, port)
+
+    asyncio.run(main())
@@ -0,0 +1,200 @@
+import csv
+import io
+import logging
+import zipfile
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+from xml.etree import ElementTree
+
+import constants
+from helpers import valid_extension
+
+# Tells what kind of input a file is by looking at the start of its contents, without
+# parsing all of it: the header row (and first data row) of a CSV, or the first few
+# rows of the first sheet of a workbook. Fast enough to run on drag-enter.
+# Only uses the standard library, so that it does not slow down startup.
+
+logger = logging.getLogger(__name__)
+
+FILE_UNKNOWN: str = "unknown"
+FILE_TEAMS: str = "teams"
+FILE_ROSTER: str = "roster"
+
+CSV_SNIFF_BYTES: int = 8 * 1024
+CSV_SNIFF_MAX_BYTES: int = 256 * 1024  # For headers with a great many assignments
+XLSX_SIGNATURE: bytes = b"PK\x03\x04"
+XLS_SIGNATURE: bytes = b"\xd0\xcf\x11\xe0"
+ROSTER_HEADER_SEARCH_ROWS: int = 10  # Rows to look through for the roster's header
+
+SHEET_NS: str = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+REL_NS: str = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PACKAGE_REL_NS: str = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+class FileKind(NamedTuple):
+    kind: str  # FILE_UNKNOWN, FILE_TEAMS or FILE_ROSTER
+    assignments: int = 0  # Assignments in a Teams file
+
+    @property
+    def is_teams(self) -> bool:
+        return self.kind == FILE_TEAMS
+
+    @property
+    def is_roster(self) -> bool:
+        return self.kind == FILE_ROSTER
+
+    @property
+    def multi_assignment(self) -> bool:
+        return self.assignments > 1
+
+
+UNKNOWN: FileKind = FileKind(FILE_UNKNOWN)
+
+
+def sniff(file: Path) -> FileKind:
+    """
+    Classify a file as a Teams grades export, a Student Portal workbook, or neither
+
+    Files that cannot be read are unknown, as are files with an extension other than
+    those in constants.VALID_EXTENSIONS.
+
+    :param file: Path
+    :return: FileKind
+    """
+    if not valid_extension(file):
+        return UNKNOWN
+    try:
+        with open(file, "rb") as f:
+            start = f.read(CSV_SNIFF_BYTES)
+            if start.startswith(XLSX_SIGNATURE):
+                kind = _sniff_xlsx(file)
+            elif start.startswith(XLS_SIGNATURE):
+                kind = _sniff_xls(file)
+            else:
+                kind = _sniff_csv(f, start)
+    except (
+        OSError,
+        ValueError,
+        KeyError,
+        zipfile.BadZipFile,
+        ElementTree.ParseError,
+    ) as e:
+        logger.debug(f"Unable to sniff {file.name}: {e}")
+        kind = UNKNOWN
+    logger.debug(f"Sniffed {file.name}: {kind}")
+    return kind
+
+
+def _sniff_csv(f: io.BufferedReader, start: bytes) -> FileKind:
+    # A Teams export has first name, last name, email, then three columns per assignment
+    while start.count(b"\n") < 2 and len(start) < CSV_SNIFF_MAX_BYTES:
+        more = f.read(CSV_SNIFF_BYTES)
+        if not more:
+            break
+        start += more
+    if b"\0" in start:  # Binary
+        return UNKNOWN
+    text = start.decode("utf-8-sig", errors="replace")
+    rows = csv.reader(io.StringIO(text))
+    header = next(rows, [])
+    first_row = next(rows, None)
+    email_col = constants.TEAMS_CSV["email_col"]
+    first = constants.TEAMS_CSV["first_assignment_col"]
+    if len(header) < first + 2:
+        return UNKNOWN
+    if first_row is not None and len(first_row) > email_col:
+        looks_like_teams = "@" in first_row[email_col]
+    else:  # Nobody in the export
+        looks_like_teams = "email" in header[email_col].lower()
+    if not looks_like_teams:
+        return UNKNOWN
+    return FileKind(
+        FILE_TEAMS, len(header[first :: constants.TEAMS_CSV["assignment_width"]])
+    )
+
+
+def _sniff_xlsx(file: Path) -> FileKind:
+    # A Student Portal workbook has the StuID and Username headers in one of its first
+    # rows. Only the first sheet's opening rows (and the shared strings they use) are
+    # read, streaming, so this takes the same time however many students there are.
+    with zipfile.ZipFile(file) as archive:
+        sheet = _first_sheet(archive)
+        rows = _first_rows(archive, sheet, ROSTER_HEADER_SEARCH_ROWS)
+        indices = [index for row in rows for _, index in row if index is not None]
+        strings = _shared_strings(archive, max(indices)) if indices else []
+    wanted = set(constants.STUDENT_LOGINS["usecols"])
+    for row in rows:
+        values = {
+            (strings[index] if index is not None and index < len(strings) else text)
+            for text, index in row
+        }
+        if wanted <= values:
+            return FileKind(FILE_ROSTER)
+    return UNKNOWN
+
+
+def _sniff_xls(file: Path) -> FileKind:
+    # The old binary format can't be read without parsing the whole thing, so go by
+    # the name, as the GUI always used to
+    return FileKind(FILE_ROSTER) if "Student Portal" in file.name else UNKNOWN
+
+
+def _first_sheet(archive: zipfile.ZipFile) -> str:
+    # Path in the archive of the first sheet, following workbook.xml and its rels
+    workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    first = workbook.find(f"{SHEET_NS}sheets/{SHEET_NS}sheet")
+    if first is None:
+        raise ValueError("Workbook has no sheets")
+    rel_id = first.get(f"{REL_NS}id")
+    rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{PACKAGE_REL_NS}Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target", "")
+            return target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+    raise ValueError(f"Sheet {rel_id} not found in workbook")
+
+
+# A cell's text, or (for shared strings) None and its index into the shared strings
+Cell = Tuple[Optional[str], Optional[int]]
+Row = List[Cell]
+
+
+def _first_rows(archive: zipfile.ZipFile, sheet: str, count: int) -> List[Row]:
+    rows: List[Row] = []
+    with archive.open(sheet) as f:
+        for _, element in ElementTree.iterparse(f):
+            if element.tag != f"{SHEET_NS}row":
+                continue
+            if int(element.get("r", len(rows) + 1)) > count:
+                break
+            rows.append([_cell(cell) for cell in element.iter(f"{SHEET_NS}c")])
+            element.clear()
+    return rows
+
+
+def _cell(cell: ElementTree.Element) -> Cell:
+    kind = cell.get("t")
+    if kind == "s":
+        value = cell.findtext(f"{SHEET_NS}v")
+        return None, int(value) if value is not None else None
+    if kind == "inlineStr":
+        return "".join(t.text or "" for t in cell.iter(f"{SHEET_NS}t")), None
+    return cell.findtext(f"{SHEET_NS}v"), None
+
+
+def _shared_strings(archive: zipfile.ZipFile, last: int) -> List[str]:
+    # Only as far as index last, the table can hold every username in the workbook
+    strings: List[str] = []
+    try:
+        f = archive.open("xl/sharedStrings.xml")
+    except KeyError:
+        return strings
+    with f:
+        for _, element in ElementTree.iterparse(f):
+            if element.tag != f"{SHEET_NS}si":
+                continue
+            strings.append("".join(t.text or "" for t in element.iter(f"{SHEET_NS}t")))
+            element.clear()
+            if len(strings) > last:
+                break
+    return strings
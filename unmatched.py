@@ -0,0 +1,127 @@
+import csv
+import logging
+from pathlib import Path
+from typing import List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+import constants
+from profiling import stage
+from roster import StudentRoster
+
+# Students in a Teams export that could not be given a student ID.
+# match_grades marks each row with an Issue as it matches, and a report of the marked
+# rows is written next to each ATLAS file, with close usernames from the roster as
+# suggestions, so problems are found before the file is uploaded.
+
+logger = logging.getLogger(__name__)
+
+ISSUE_UNMATCHED: str = "Not in student logins"
+ISSUE_AMBIGUOUS: str = "More than one student ID"
+ISSUES: List[str] = [ISSUE_UNMATCHED, ISSUE_AMBIGUOUS]
+
+
+class ReportSummary(NamedTuple):
+    output: Path  # ATLAS file
+    report: Path
+    unmatched: int
+    ambiguous: int
+
+    def __str__(self) -> str:
+        problems: List[str] = []
+        if self.unmatched:
+            problems.append(f"{self.unmatched} student(s) not in the student logins")
+        if self.ambiguous:
+            problems.append(f"{self.ambiguous} with more than one student ID")
+        return f"{self.output.name}: {', '.join(problems)}, see {self.report.name}"
+
+
+def report_file(output: Path) -> Path:
+    return output.with_name(f"{output.stem}{constants.UNMATCHED_REPORT_SUFFIX}")
+
+
+def issues(positions: np.ndarray, roster: StudentRoster) -> pd.Categorical:
+    """
+    The issue with each matched row, if any
+
+    :param positions: np.ndarray, from StudentRoster.locate
+    :param roster: StudentRoster
+    :return: pd.Categorical, one of ISSUES, or NaN if the row matched cleanly
+    """
+    codes = np.full(len(positions), -1, dtype=np.int8)
+    found = positions != -1
+    codes[~found] = ISSUES.index(ISSUE_UNMATCHED)
+    if roster.ambiguous.any():
+        ambiguous = found.copy()
+        ambiguous[found] = roster.ambiguous.take(positions[found])
+        codes[ambiguous] = ISSUES.index(ISSUE_AMBIGUOUS)
+    return pd.Categorical.from_codes(codes, categories=ISSUES)
+
+
+def report_rows(matched: pd.DataFrame, index: int, name: str) -> pd.DataFrame:
+    """
+    The rows of one assignment that have an issue, laid out for the report
+
+    :param matched: pd.DataFrame, from process.match_grades
+    :param index: int, position of the assignment in the file
+    :param name: str, assignment name
+    :return: pd.DataFrame
+    """
+    rows = matched.loc[
+        (matched["Assignment"].to_numpy() == index) & matched["Issue"].notna(),
+        ["Email Address", "Points", "StuID", "Issue"],
+    ]
+    rows = rows.astype({"Email Address": object})  # Not categorical, to concatenate
+    return rows.rename(columns={"Email Address": "Username", "Points": name})
+
+
+def write_report(rows: pd.DataFrame, roster: StudentRoster, output: Path) -> None:
+    """
+    Write the report for an ATLAS file, or remove an old one if there are no issues
+
+    :param rows: pd.DataFrame, from report_rows (or several of them concatenated)
+    :param roster: StudentRoster, for suggestions
+    :param output: Path, the ATLAS file
+    :return: None
+    """
+    report = report_file(output)
+    if rows.empty:
+        report.unlink(missing_ok=True)  # Left over from an earlier run
+        return
+    with stage("report", rows=len(rows)):
+        unmatched = rows.loc[rows["Issue"] == ISSUE_UNMATCHED, "Username"].unique()
+        suggestions = {
+            username: ", ".join(roster.suggest(username)) for username in unmatched
+        }
+        rows = rows.assign(Suggestions=rows["Username"].map(suggestions).fillna(""))
+        rows.to_csv(report, index=False)
+    logger.info(str(_summary(output, report, rows["Issue"])))
+
+
+def summarize(outputs: List[Path]) -> List[ReportSummary]:
+    """
+    Summaries of the reports written for ATLAS files, for those that have one
+
+    :param outputs: List[Path], ATLAS files
+    :return: List[ReportSummary]
+    """
+    summaries: List[ReportSummary] = []
+    for output in outputs:
+        report = report_file(output)
+        try:
+            with open(report, "r", newline="") as f:
+                issues_column = [row["Issue"] for row in csv.DictReader(f)]
+        except FileNotFoundError:
+            continue
+        summaries.append(_summary(output, report, pd.Series(issues_column)))
+    return summaries
+
+
+def _summary(output: Path, report: Path, issues_column: pd.Series) -> ReportSummary:
+    return ReportSummary(
+        output=output,
+        report=report,
+        unmatched=int((issues_column == ISSUE_UNMATCHED).sum()),
+        ambiguous=int((issues_column == ISSUE_AMBIGUOUS).sum()),
+    )
@@ -0,0 +1,232 @@
+import json
+import logging
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import constants
+from helpers import file_hash, valid_extension
+from model import class_period
+from sniff import sniff
+
+# Watch mode: process Teams exports as they are dropped into a folder.
+# This module has no Qt dependency; the GUI drives FolderWatcher from a
+# QFileSystemWatcher, while the command line polls it with watch_directory.
+# process (and pandas) is only imported once there is a file to process.
+
+logger = logging.getLogger(__name__)
+
+FileSignature = Tuple[int, int]  # (size, mtime in ns)
+
+
+class FolderWatcher:
+    """
+    Finds Teams exports in a folder that are new or changed, once they have settled
+
+    A file is only reported after its size and modification time have stayed the same
+    for settle seconds, so files that are still being copied in are not picked up
+    half-written. Each version of a file is reported once, and only if its contents
+    show it to be a Teams export.
+    """
+
+    def __init__(
+        self, directory: Path, settle: float = constants.WATCH_SETTLE_SECONDS
+    ) -> None:
+        self.directory: Path = directory
+        self.settle: float = settle
+        self.__seen: Dict[Path, Tuple[FileSignature, float]] = {}
+        self.__reported: Dict[Path, FileSignature] = {}
+
+    @property
+    def pending(self) -> bool:
+        """Whether any file has been seen but has not settled yet"""
+        return any(
+            self.__reported.get(file) != signature
+            for file, (signature, _) in self.__seen.items()
+        )
+
+    def poll(self) -> List[Path]:
+        """
+        Scan the folder once
+
+        :return: List[Path], files that have settled since the last poll
+        """
+        now = time.monotonic()
+        ready: List[Path] = []
+        current: Set[Path] = set()
+        for file in sorted(self.directory.iterdir()):
+            if not valid_extension(file):
+                continue
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            if not file.is_file():
+                continue
+            current.add(file)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self.__seen.get(file)
+            if previous is None or previous[0] != signature:
+                self.__seen[file] = (signature, now)
+                continue
+            if now - previous[1] >= self.settle and (
+                self.__reported.get(file) != signature
+            ):
+                self.__reported[file] = signature
+                if not sniff(file).is_teams:
+                    logger.debug(f"Not a Teams export, ignoring: {file.name}")
+                elif not _has_period(file):
+                    logger.warning(f"Skipping file without a class period: {file.name}")
+                else:
+                    ready.append(file)
+        for file in set(self.__seen) - current:  # Deleted or renamed
+            del self.__seen[file]
+            self.__reported.pop(file, None)
+        return ready
+
+    def retry(self, files: List[Path]) -> None:
+        """
+        Report files again on the next poll, as they could not be processed this time
+
+        :param files: List[Path], from poll()
+        :return: None
+        """
+        for file in files:
+            self.__reported.pop(file, None)
+
+
+def _has_period(file: Path) -> bool:
+    # Outputs are named after the class period, which only the file name gives
+    try:
+        class_period(file)
+    except ValueError:
+        return False
+    return True
+
+
+class ProcessedLedger:
+    """
+    Content hashes of the Teams exports already processed into an output folder
+
+    Kept as a small JSON file, so that restarting watch mode, or the same export being
+    dropped in again under another name, does not produce the files a second time.
+    """
+
+    def __init__(self, file: Path) -> None:
+        self.file: Path = file
+        self.__entries: Dict[str, Dict[str, object]] = {}
+        try:
+            with open(file, "r") as f:
+                self.__entries = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable ledger {file}: {e}")
+
+    def __contains__(self, content_hash: str) -> bool:
+        return content_hash in self.__entries
+
+    def add(self, content_hash: str, source: Path, outputs: List[Path]) -> None:
+        self.__entries[content_hash] = {
+            "source": str(source),
+            "outputs": [str(output) for output in outputs],
+            "processed": time.time(),
+        }
+        tmp = self.file.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.__entries, f, indent=1)
+        tmp.replace(self.file)
+
+
+def process_new_files(
+    files: List[Path],
+    student_list: Union[Path, Sequence[Path]],
+    output_dir: Path,
+    ledger: ProcessedLedger,
+) -> Tuple[List[Path], List[Path]]:
+    """
+    Process files found by a FolderWatcher, skipping any already in the ledger
+
+    :param files: List[Path]
+    :param student_list: Union[Path, Sequence[Path]], one or more student logins files
+    :param output_dir: Path
+    :param ledger: ProcessedLedger
+    :return: Tuple[List[Path], List[Path]], the files written and the inputs that failed
+    """
+    from process import generate_outputs
+    from roster import load_rosters
+
+    written: List[Path] = []
+    failed: List[Path] = []
+    if not files:
+        return written, failed
+    roster = load_rosters(student_list)  # Reloaded only if a file has changed
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for file in files:
+        try:
+            content_hash = file_hash(file)
+            if content_hash in ledger:
+                logger.info(f"Already processed, skipping: {file.name}")
+                continue
+            logger.info(f"Processing new file: {file.name}")
+            outputs = generate_outputs(
+                assignment_file=file, roster=roster, output_dir=output_dir
+            )
+            ledger.add(content_hash, file, outputs)
+        except Exception as e:
+            logger.error(f"Failed to process {file.name}: {e}")
+            failed.append(file)
+        else:
+            written.extend(outputs)
+    return written, failed
+
+
+def watch_directory(
+    directory: Path,
+    student_list: Union[Path, Sequence[Path]],
+    output_dir: Path,
+    interval: float = constants.WATCH_POLL_SECONDS,
+    settle: float = constants.WATCH_SETTLE_SECONDS,
+    stop: Optional[threading.Event] = None,
+    report: Optional[Callable[[List[Path], List[Path]], None]] = None,
+) -> None:
+    """
+    Poll a folder and process new Teams exports until stopped
+
+    If the folder can't be read, or the student logins can't be loaded, the error is
+    logged and the files found are processed on a later poll instead.
+
+    :param directory: Path
+    :param student_list: Union[Path, Sequence[Path]], one or more student logins files
+    :param output_dir: Path
+    :param interval: float, seconds between polls
+    :param settle: float, seconds a file must be unchanged before it is processed
+    :param stop: Optional[threading.Event], set to stop watching
+    :param report: Optional callable, given the files written and the inputs that
+                   failed after every poll that processed something
+    :return: None
+    """
+    stop = stop or threading.Event()
+    watcher = FolderWatcher(directory, settle=settle)
+    ledger = ProcessedLedger(output_dir.joinpath(constants.WATCH_LEDGER_NAME))
+    logger.info(f"Watching {directory} for Teams exports, writing to {output_dir}")
+    while not stop.is_set():
+        # The folder or the student logins may be missing for a moment (a share
+        # reconnecting, a workbook being saved over), so that is only tried again later
+        try:
+            files = watcher.poll()
+        except OSError as e:
+            logger.warning(f"Unable to read {directory}, will try again: {e}")
+            files = []
+        try:
+            written, failed = process_new_files(files, student_list, output_dir, ledger)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            logger.warning(f"Unable to load the student logins, will try again: {e}")
+            watcher.retry(files)
+            written, failed = [], []
+        if report is not None and (written or failed):
+            report(written, failed)
+        stop.wait(interval)
+    logger.info("Stopped watching")
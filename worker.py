@@ -0,0 +1,207 @@
+import logging
+import threading
+from pathlib import Path
+from typing import Any, List, Optional
+
+from PyQt5 import QtCore
+
+import check_updates
+from watch import ProcessedLedger
+
+# process and roster (and through them pandas) are imported when a worker runs, not
+# when this module is imported, to keep the time until the window appears short.
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerSignals(QtCore.QObject):
+    progress = QtCore.pyqtSignal(str, int)
+    finished = QtCore.pyqtSignal(list)
+    error = QtCore.pyqtSignal(str)
+    cancelled = QtCore.pyqtSignal()
+
+
+class ProcessWorker(QtCore.QRunnable):
+    """
+    Generate output file(s) on a QThreadPool thread, keeping the GUI responsive
+
+    If output is given only the most recent assignment is written there, otherwise
+    every assignment is written to output_dir. Progress, the list of files written,
+    errors and cancellation are all reported through self.signals. Grades already
+    read by a PreloadWorker can be passed in, so that the file is not read again.
+    """
+
+    def __init__(
+        self,
+        assignment_file: Path,
+        student_list: Path,
+        output: Optional[Path] = None,
+        output_dir: Optional[Path] = None,
+        grades: Optional[Any] = None,
+    ) -> None:
+        super(ProcessWorker, self).__init__()
+        self.assignment_file: Path = assignment_file
+        self.student_list: Path = student_list
+        self.output: Optional[Path] = output
+        self.output_dir: Optional[Path] = output_dir
+        self.grades: Optional[Any] = grades  # From read_grades, if already read
+        self.signals = WorkerSignals()
+        self.__cancel = threading.Event()
+
+    def cancel(self) -> None:
+        """
+        Ask the worker to stop; it does so when the current stage finishes
+
+        :return: None
+        """
+        logger.info("Cancelling processing...")
+        self.__cancel.set()
+
+    def __progress(self, stage: str, percent: int) -> None:
+        from process import Cancelled
+
+        if self.__cancel.is_set():
+            raise Cancelled(stage)
+        logger.debug(f"Progress: {stage} ({percent}%)")
+        self.signals.progress.emit(stage, percent)
+
+    def run(self) -> None:
+        from process import Cancelled, generate_output_from_roster, generate_outputs
+        from roster import load_roster
+
+        try:
+            self.__progress("Loading student logins", 0)
+            roster = load_roster(self.student_list)
+            if self.output is not None:
+                generate_output_from_roster(
+                    assignment_file=self.assignment_file,
+                    roster=roster,
+                    output=self.output,
+                    progress=self.__progress,
+                    grades=self.grades,
+                )
+                written: List[Path] = [self.output]
+            else:
+                written = generate_outputs(
+                    assignment_file=self.assignment_file,
+                    roster=roster,
+                    output_dir=self.output_dir,
+                    progress=self.__progress,
+                    grades=self.grades,
+                )
+        except Cancelled as e:
+            logger.info(f"Processing cancelled before: {e}")
+            self.signals.cancelled.emit()
+        except Exception as e:
+            logger.exception("Processing failed")
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(written)
+
+
+class PreloadSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(object)
+    error = QtCore.pyqtSignal(str)
+
+
+class PreloadWorker(QtCore.QRunnable):
+    """
+    Parse a dropped file on a QThreadPool thread, before Process is clicked
+
+    A student logins file is loaded into the roster cache (see roster.load_roster), a
+    Teams export is read with process.read_grades, and the result is reported through
+    self.signals.finished. A cancelled worker (because another file was dropped) does
+    not start, or if it already has, does not report its result.
+    """
+
+    def __init__(self, file: Path, roster: bool) -> None:
+        super(PreloadWorker, self).__init__()
+        self.file: Path = file
+        self.roster: bool = roster  # A student logins file, or else a Teams export
+        self.signals = PreloadSignals()
+        self.__cancel = threading.Event()
+
+    def cancel(self) -> None:
+        self.__cancel.set()
+
+    def run(self) -> None:
+        if self.__cancel.is_set():
+            return
+        logger.debug(f"Preloading {self.file.name}")
+        try:
+            if self.roster:
+                from roster import load_roster
+
+                result = load_roster(self.file)
+            else:
+                from process import read_grades
+
+                result = read_grades(self.file)
+        except Exception as e:
+            # Not fatal: the file is read again, and any error shown, on Process
+            logger.warning(f"Unable to preload {self.file.name}: {e}")
+            if not self.__cancel.is_set():
+                self.signals.error.emit(str(e))
+            return
+        if not self.__cancel.is_set():
+            self.signals.finished.emit(result)
+
+
+class UpdateCheckSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(tuple, str)
+
+
+class UpdateCheckWorker(QtCore.QRunnable):
+    """
+    Look up the latest release on a QThreadPool thread
+
+    Reports the latest version and its download page through self.signals.finished.
+    Unless force is set, a result cached within the last day is used instead.
+    """
+
+    def __init__(self, force: bool = False) -> None:
+        super(UpdateCheckWorker, self).__init__()
+        self.force: bool = force
+        self.signals = UpdateCheckSignals()
+
+    def run(self) -> None:
+        version, link = check_updates.cached_latest_ver(force=self.force)
+        self.signals.finished.emit(version, link)
+
+
+class WatchSignals(QtCore.QObject):
+    finished = QtCore.pyqtSignal(list, list)
+
+
+class WatchWorker(QtCore.QRunnable):
+    """
+    Process files found in a watched folder on a QThreadPool thread
+
+    Reports the files written and the inputs that failed through self.signals.finished.
+    """
+
+    def __init__(
+        self,
+        files: List[Path],
+        student_list: Path,
+        output_dir: Path,
+        ledger: ProcessedLedger,
+    ) -> None:
+        super(WatchWorker, self).__init__()
+        self.files: List[Path] = files
+        self.student_list: Path = student_list
+        self.output_dir: Path = output_dir
+        self.ledger: ProcessedLedger = ledger
+        self.signals = WatchSignals()
+
+    def run(self) -> None:
+        from watch import process_new_files
+
+        try:
+            written, failed = process_new_files(
+                self.files, self.student_list, self.output_dir, self.ledger
+            )
+        except Exception:
+            logger.exception("Processing watched files failed")
+            written, failed = [], self.files
+        self.signals.finished.emit(written, failed)
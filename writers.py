@@ -0,0 +1,221 @@
+import logging
+import os
+import re
+from pathlib import Path
+from typing import List, Sequence, Set
+
+import pandas as pd
+from openpyxl import Workbook
+
+import constants
+from constants import (
+    DEFAULT_WRITER,
+    WRITER_CSV,
+    WRITER_PANDAS,
+    WRITER_STREAMING,
+    WRITERS,
+)
+from profiling import stage
+
+# Output backends for ATLAS files, see constants.WRITERS
+
+logger = logging.getLogger(__name__)
+
+# Characters Excel does not allow in sheet titles
+INVALID_SHEET_CHARACTERS = re.compile(r"[\[\]:*?/\\]")
+# Enough digits for any student ID or grade, without an ".0" on whole numbers
+CSV_FLOAT_FORMAT: str = "%.15g"
+
+
+class StreamingWorkbook:
+    """
+    A single-sheet workbook written in openpyxl's write-only mode
+
+    Rows can be appended in as many batches as needed; nothing is written to the output
+    file until save().
+    """
+
+    def __init__(self, output: Path, header: Sequence[str]) -> None:
+        self.output: Path = output
+        self.rows: int = 0
+        self.__workbook = Workbook(write_only=True)
+        self.__sheet = self.__workbook.create_sheet("Sheet1")
+        self.__sheet.append(list(header))
+
+    def append_frame(self, frame: pd.DataFrame) -> None:
+        """
+        Append every row of a DataFrame, with NaN written as an empty cell
+
+        :param frame: pd.DataFrame
+        :return: None
+        """
+        _append_frame(self.__sheet, frame)
+        self.rows += len(frame)
+
+    def save(self) -> None:
+        logger.debug(f"Saving {self.rows} rows to {self.output.name}")
+        self.__workbook.save(self.output)
+
+    def discard(self) -> None:
+        """Give up on the output; as nothing has been written, there is nothing to do"""
+
+
+class StreamingCsv:
+    """
+    A CSV output that rows are appended to in batches, like StreamingWorkbook
+
+    Rows are written to a temporary file next to the output as they are appended, and
+    it only replaces the output on save(), so a run that fails part way never leaves
+    a truncated file (or overwrites a good one from an earlier run).
+    """
+
+    def __init__(self, output: Path, header: Sequence[str]) -> None:
+        self.output: Path = output
+        self.rows: int = 0
+        self.__tmp: Path = output.with_name(f"{output.name}.tmp")
+        self.__file = open(self.__tmp, "w", newline="")
+        pd.DataFrame(columns=list(header)).to_csv(self.__file, index=False)
+
+    def append_frame(self, frame: pd.DataFrame) -> None:
+        frame.to_csv(
+            self.__file, header=False, index=False, float_format=CSV_FLOAT_FORMAT
+        )
+        self.rows += len(frame)
+
+    def save(self) -> None:
+        self.__file.close()
+        os.replace(self.__tmp, self.output)
+        logger.debug(f"Saved {self.rows} rows to {self.output.name}")
+
+    def discard(self) -> None:
+        """Remove the temporary file, unless already saved; the output is left alone"""
+        if not self.__file.closed:
+            self.__file.close()
+            self.__tmp.unlink(missing_ok=True)
+
+
+class SheetsWorkbook:
+    """
+    Several ATLAS outputs as the sheets of one workbook, in openpyxl's write-only mode
+
+    A workbook costs the same to set up and save however little is in it (the zip
+    container, styles, the shared strings table), which for small outputs is most of
+    the time spent writing them. Here that is paid once for all of them, and strings
+    repeated across sheets are stored once, in the one shared strings table.
+    """
+
+    def __init__(self, output: Path) -> None:
+        self.output: Path = output
+        self.rows: int = 0
+        self.titles: List[str] = []
+        self.__taken: Set[str] = set()  # Titles in lower case, as Excel compares them
+        self.__workbook = Workbook(write_only=True)
+
+    def add_frame(self, name: str, frame: pd.DataFrame) -> str:
+        """
+        Add a DataFrame as a new sheet, with its columns as the header row
+
+        :param name: str, sheet title, made valid and unique with sheet_title
+        :param frame: pd.DataFrame
+        :return: str, the title the sheet was given
+        """
+        title = sheet_title(name, self.__taken)
+        with stage("write", rows=len(frame)):
+            sheet = self.__workbook.create_sheet(title)
+            sheet.append([str(column) for column in frame.columns])
+            _append_frame(sheet, frame)
+        self.titles.append(title)
+        self.rows += len(frame)
+        return title
+
+    def save(self) -> None:
+        logger.debug(
+            f"Saving {len(self.titles)} sheets, {self.rows} rows, to {self.output.name}"
+        )
+        if not self.titles:  # A workbook needs at least one sheet
+            self.__workbook.create_sheet("Sheet1")
+        self.__workbook.save(self.output)
+
+
+def sheet_title(name: str, taken: Set[str]) -> str:
+    """
+    A title for a sheet that Excel will accept, and that is not already taken
+
+    Titles are at most constants.SHEET_TITLE_MAX_LENGTH characters, without any of
+    []:*?/\\ (replaced with "_") and not starting or ending with an apostrophe. A name
+    already taken (in any case) gets a " (2)", " (3)", ... suffix, cutting the name
+    shorter to make room for it if need be.
+
+    :param name: str
+    :param taken: Set[str], titles in use, in lower case; updated in place
+    :return: str
+    """
+    limit = constants.SHEET_TITLE_MAX_LENGTH
+    title = INVALID_SHEET_CHARACTERS.sub("_", name).strip("'") or "Sheet"
+    unique = title[:limit]
+    count = 2
+    while unique.lower() in taken:
+        suffix = f" ({count})"
+        unique = f"{title[: limit - len(suffix)]}{suffix}"
+        count += 1
+    taken.add(unique.lower())
+    return unique
+
+
+def output_suffix(writer: str) -> str:
+    """
+    File extension of the outputs of a writer, ".xlsx" or ".csv"
+
+    :param writer: str, one of WRITERS
+    :return: str
+    """
+    return constants.OUTPUT_SUFFIXES[writer]
+
+
+def streaming_output(output: Path, header: Sequence[str], writer: str):
+    """
+    A StreamingCsv for the csv writer, otherwise a StreamingWorkbook
+
+    :param output: Path
+    :param header: Sequence[str]
+    :param writer: str, one of WRITERS
+    :return: StreamingWorkbook or StreamingCsv
+    """
+    if writer == WRITER_CSV:
+        return StreamingCsv(output, header)
+    return StreamingWorkbook(output, header)
+
+
+def _append_frame(sheet, frame: pd.DataFrame) -> None:
+    # Every row of a DataFrame onto a write-only sheet, with NaN as an empty cell
+    columns = [
+        [None if pd.isna(value) else value for value in frame[column].tolist()]
+        for column in frame.columns
+    ]
+    for row in zip(*columns):
+        sheet.append(row)
+
+
+def write_output(
+    frame: pd.DataFrame, output: Path, writer: str = DEFAULT_WRITER
+) -> None:
+    """
+    Write an ATLAS file with the chosen backend
+
+    :param frame: pd.DataFrame, columns become the header row
+    :param output: Path
+    :param writer: str, one of WRITERS
+    :return: None
+    """
+    logger.debug(f"Writing {output.name} with the {writer} writer")
+    if writer not in WRITERS:
+        raise ValueError(f"Unknown writer '{writer}', expected one of {WRITERS}")
+    with stage("write", rows=len(frame)):
+        if writer == WRITER_PANDAS:
+            frame.to_excel(output, index=False)
+        elif writer == WRITER_STREAMING:
+            workbook = StreamingWorkbook(output, header=[str(c) for c in frame.columns])
+            workbook.append_frame(frame)
+            workbook.save()
+        elif writer == WRITER_CSV:
+            frame.to_csv(output, index=False, float_format=CSV_FLOAT_FORMAT)